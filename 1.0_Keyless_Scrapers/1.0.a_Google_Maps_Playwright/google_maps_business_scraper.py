@@ -9,7 +9,7 @@ LICENSE: MIT
 ORIGINAL: https://colab.research.google.com/drive/1-EjSA62m5QuD8-t32OLa65F0m7oC7tMP
 
 DEPENDENCIES:
-  pip install gspread google-auth pandas requests beautifulsoup4 lxml 
+  pip install gspread google-auth pandas aiohttp beautifulsoup4 lxml 
   pip install openpyxl fake-useragent tldextract playwright nest-asyncio
   playwright install chromium
 
@@ -24,6 +24,7 @@ OUTPUT: BusinessLeadRecord[]
   - business_category (Category)
   - rating (Rating)
   - review_count (Total Reviews)
+  - business_zip (ZIP)
 
 DESCRIPTION:
   This scraper navigates Google Maps, searches for businesses by keyword + location,
@@ -31,9 +32,9 @@ DESCRIPTION:
   to discover email addresses via contact page crawling and mailto: link extraction.
 
 ANTI-BOT MEASURES HANDLED:
-  - Rotating User-Agent via fake_useragent
+  - Rotating header profiles per host via fake_useragent (HeaderPool)
   - ScraperAPI fallback for blocked requests
-  - Human-like typing delays
+  - Human-like typing delays and pauses (WAIT_PROFILE)
   - Consent dialog handling ("Accept all")
   - Rate limiting via semaphores
 
@@ -45,26 +46,70 @@ SELF-CONTAINED: Yes - Copy this file anywhere and it runs independently.
 # DEPENDENCIES
 # ═══════════════════════════════════════════════════════════════════════════════════
 
-# !pip install gspread google-auth pandas requests beautifulsoup4 lxml openpyxl fake-useragent tldextract playwright nest-asyncio
+# !pip install gspread google-auth pandas aiohttp beautifulsoup4 lxml openpyxl fake-useragent tldextract playwright nest-asyncio
 # !playwright install chromium
 
+import os
 import re
+import sys
+import csv
+import json
 import time
+import argparse
+import importlib
+import statistics
+import subprocess
+import zlib
+import hashlib
 import random
+import socket
 import asyncio
+import sqlite3
 import warnings
-import requests
 import traceback
-import tldextract
-import pandas as pd
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse, unquote
-from fake_useragent import UserAgent
+import functools
+import contextlib
+import multiprocessing
+from urllib.parse import urljoin, urlparse, urlunparse, unquote, quote_plus, parse_qsl, urlencode
 from concurrent.futures import ThreadPoolExecutor
-from playwright.async_api import async_playwright
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
+
+class _LazyModule:
+    """Module imported on first attribute access, so start-up only pays for what a stage uses."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+# Heavy third-party modules (pandas alone takes ~0.5 s to import)
+pd = _LazyModule('pandas')
+aiohttp = _LazyModule('aiohttp')
+tldextract = _LazyModule('tldextract')
+
+
+def async_playwright():
+    """playwright.async_api.async_playwright(), imported on first use."""
+    from playwright.async_api import async_playwright as start
+    return start()
+
+
+def _env(name, default):
+    """CONSTANT override from the environment variable of the same name, cast like the default."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    if value.strip().lower() in ('', 'none'):
+        return None
+    return type(default)(value) if isinstance(default, (int, float)) else value
+
 # ═══════════════════════════════════════════════════════════════════════════════════
 # CONSTANTS
 # ═══════════════════════════════════════════════════════════════════════════════════
@@ -72,10 +117,132 @@ warnings.simplefilter(action='ignore', category=FutureWarning)
 EMAIL_REGEX = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
 
 # ScraperAPI fallback key (replace with your own or remove if not needed)
-SCRAPERAPI_KEY = "69ceba7bcab653d66d03843b47bada72"
+SCRAPERAPI_KEY = _env('SCRAPERAPI_KEY', "69ceba7bcab653d66d03843b47bada72")
+
+# Shared async HTTP client used for website crawling
+HTTP_TIMEOUT = 20            # Seconds per request
+HTTP_MAX_CONNECTIONS = _env('HTTP_MAX_CONNECTIONS', 100)   # Global cap on open connections
+HTTP_MAX_PER_HOST = _env('HTTP_MAX_PER_HOST', 4)    # Cap per host (connections are kept alive and reused)
+HTTP_KEEPALIVE = 30          # Seconds an idle connection stays in the pool
+ENRICH_CONCURRENCY = _env('ENRICH_CONCURRENCY', 20)      # Websites crawled at once (enrichment workers)
+PIPELINE_QUEUE_SIZE = 50     # Max records waiting between pipeline stages
+WRITER_BATCH_SIZE = 50       # Finished records normalized together by the writer
+VALIDATE_CONCURRENCY = _env('VALIDATE_CONCURRENCY', 20)  # Domains validated at once
+
+# Per-host politeness for website crawling and domain validation
+HOST_MAX_CONCURRENCY = 2     # Requests in flight per host
+HOST_MIN_INTERVAL = 1.0      # Seconds between request starts on the same host
+SITE_PAGE_BUDGET = 8         # Max pages fetched per website (homepage included)
+BREAKER_FAILURES = 3         # Consecutive failures (errors, 403, 429, 5xx) that open a host's circuit
+BREAKER_COOLDOWN = 600       # Seconds an open circuit skips the host
+
+# Contact discovery: 'ranked' (best pages first, stop at a confident email) or
+# 'exhaustive' (every footer and contact link, the original behaviour)
+CONTACT_DISCOVERY = "ranked"
+CONTACT_WAVE_SIZE = 2        # Ranked pages fetched at once between confidence checks
+CONTACT_CONFIDENT_SCORE = 80 # Any email on a page scoring this high ends the search
+CONTACT_BENCH_SITES = 200    # Labelled synthetic sites in benchmark-contacts
+
+# ScraperAPI fallback is paid: cap it per process (None = unlimited)
+SCRAPERAPI_BUDGET = _env('SCRAPERAPI_BUDGET', 500)      # Fallback calls allowed
+SCRAPERAPI_CREDITS_PER_CALL = 1
+
+# Header profiles: User-Agent data is loaded once; each host keeps one coherent profile
+HEADER_POOL_SIZE = 24
+ACCEPT_LANGUAGES = ("en-US,en;q=0.9", "en-GB,en;q=0.9", "en-US,en;q=0.8", "en-CA,en;q=0.9,fr;q=0.6")
+VIEWPORTS = ((1920, 1080), (1536, 864), (1440, 900), (1366, 768), (1280, 800))
+
+# Browser pool shared by all cities (independent of the per-city semaphore)
+BROWSER_POOL_SIZE = _env('BROWSER_POOL_SIZE', 2)        # Chromium processes kept running
+BROWSER_MAX_USES = 25        # Contexts a browser serves before it is recycled
+BROWSER_MAX_RSS_MB = 1500    # Recycle a browser whose process tree grows past this (needs psutil)
+
+# Max result cards harvested per keyword (None = the whole feed)
+MAPS_RESULT_CAP = None
+
+# Keywords of a city searched at once, each in its own tab of the city's browser context
+KEYWORD_TABS = 3
+
+# Adaptive waits: upper bounds for page signals (the scraper moves on as soon as they fire)
+WAIT_TIMEOUT_MS = 15000          # Search box / results feed to appear
+WAIT_STEP_TIMEOUT_MS = 5000      # More cards after a scroll, new listing after a click
+WAIT_MAX_STALLS = 3              # Scroll attempts without new cards before giving up
+
+# Optional anti-bot jitter on top of the adaptive waits (None disables it)
+WAIT_PROFILES = {
+    'human': {'pause': (0.5, 1.5), 'typing_delay_ms': (80, 200)},
+    'light': {'pause': (0.05, 0.3), 'typing_delay_ms': None},
+}
+WAIT_PROFILE = 'light'
+
+# Requests the Maps page never needs (aborted in every scraping context)
+BLOCK_RESOURCES = True
+BLOCKED_RESOURCE_TYPES = ['image', 'media', 'font']
+BLOCKED_URL_PATTERNS = [
+    r'/maps/vt',                          # Map tiles
+    r'khms?\d*\.google', r'/kh/v=',       # Satellite tiles
+    r'streetviewpixels', r'/maps/sv/',    # Street View
+    r'google-analytics\.com', r'googletagmanager\.com', r'doubleclick\.net',
+    r'/gen_204', r'google\.com/log\?', r'play\.google\.com/log',   # Telemetry
+]
+# Never blocked, even if a rule above matches
+ALLOWED_URL_PATTERNS = [r'/maps/search', r'/maps/preview/', r'/maps/api/js']
+
+# Local directory for persistent caches (created on first use)
+CACHE_DIR = "gmaps_cache"
+DOMAIN_CACHE_TTL = 30 * 24 * 3600          # Valid domains are trusted for 30 days
+DOMAIN_CACHE_NEGATIVE_TTL = 24 * 3600      # Dead domains are retried after 1 day
+PAGE_CACHE_TTL = 7 * 24 * 3600             # Pages are served from disk for 7 days, then revalidated
+PAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024   # Compressed page bodies kept on disk
+DEDUP_REFRESH_AFTER = 90 * 24 * 3600       # Known businesses/domains are re-scraped after 90 days
+
+# Streaming export: every finished record is appended to rotating files as it arrives
+STREAM_EXPORT = None                 # None (off), 'ndjson' or 'parquet'
+STREAM_DIR = "gmaps_stream"
+STREAM_ROTATE_BYTES = 64 * 1024 * 1024     # Start a new file after 64 MB ...
+STREAM_ROTATE_SECONDS = 15 * 60            # ... or after 15 minutes
+STREAM_FSYNC_SECONDS = 5.0                 # Flush + fsync at most this often
+
+# Google Maps entry page (the offline benchmark points this at its local stand-in)
+MAPS_URL = "https://www.google.com/maps?hl=en"
+
+# 'direct' opens the search URL straight on the results feed; 'typed' types the
+# query into the search box. Direct searches that get challenged fall back to typing.
+SEARCH_MODE = "direct"
+SEARCH_TYPED_FALLBACK = True
+MAPS_SEARCH_ZOOM = 13        # Map zoom when a city center (lat, lng) is known
 
 # Google Sheets document ID (replace with your own)
-GOOGLE_SHEET_ID = "1eZOOd90NPJdC9_CrI_KQJTkyk4PuB0AFJbMo7GZQYUU"
+GOOGLE_SHEET_ID = _env('GOOGLE_SHEET_ID', "1eZOOd90NPJdC9_CrI_KQJTkyk4PuB0AFJbMo7GZQYUU")
+
+# Sharded execution: cities are pulled from a SQLite work queue by worker processes
+SHARD_WORKERS = _env('SHARD_WORKERS', 1)      # >1 runs that many worker processes (each with its own browsers)
+SHARD_CITY_CONCURRENCY = _env('SHARD_CITY_CONCURRENCY', 2)   # Cities at once inside each worker process
+WORK_QUEUE_LEASE = 1800      # Seconds a claimed city stays leased without a heartbeat
+SHARD_POLL_SECONDS = 2.0     # How often the coordinator merges finished cities
+
+# Telemetry: span timings (p50/p95/p99), counters, optional per-city profiling
+TELEMETRY_ENABLED = True
+TELEMETRY_RESERVOIR = 5000   # Samples kept per span for percentiles
+TELEMETRY_PORT = None        # e.g. 9464 serves Prometheus text on http://127.0.0.1:<port>/metrics
+TELEMETRY_JSON = os.path.join(CACHE_DIR, "telemetry.json")   # Written at the end of main() (None = off)
+PROFILE_CITIES = None        # None, 'cprofile' or 'pyinstrument' (one city profiled at a time)
+PROFILE_DIR = os.path.join(CACHE_DIR, "profiles")
+
+# Where results and city statuses go: 'sheets', 'csv', 'parquet' or 'sqlite'
+SINK_BACKEND = _env('SINK_BACKEND', "sheets")
+SINK_PATH = "gmaps_results"          # Local backends add .csv / .parquet / .sqlite3
+SINK_BATCH_ROWS = 1000               # Max rows per backend write
+SHEETS_WRITES_PER_MINUTE = 50        # Stay under the Sheets API per-user write quota
+SHEETS_MAX_RETRIES = 5               # Retries on 429 / 5xx with exponential backoff
+
+# Third-party modules each CLI stage needs (the rest of the module imports them lazily)
+STAGE_IMPORTS = {
+    'scrape-maps': ('pandas', 'aiohttp', 'tldextract', 'bs4', 'lxml', 'fake_useragent',
+                    'playwright.async_api'),
+    'enrich-emails': ('aiohttp', 'tldextract', 'bs4', 'lxml', 'fake_useragent'),
+    'validate-domains': ('aiohttp', 'tldextract', 'fake_useragent'),
+}
 
 # DOM Selectors for Google Maps
 SELECTORS = {
@@ -88,6 +255,174 @@ SELECTORS = {
     'website_link': 'a.CsEnBe',
 }
 
+# EXTRACT_LISTING_JS field -> the SELECTORS entry it is read with (selector miss counters)
+LISTING_SELECTORS = {
+    'title': 'title_xpath',
+    'category': 'category_xpath',
+    'rating': 'rating_xpath',
+    'reviews': 'reviews_xpath',
+    'website': 'website_link',
+}
+
+# In-page extraction of the open listing: one evaluate() returns every field.
+# Waits up to `timeout` ms for the panel to show the clicked card, then reads
+# the SELECTORS XPaths and the Address/Phone button aria-labels in a single
+# pass. The listing read last is kept in the page (window.__gmapsListing).
+EXTRACT_LISTING_JS = """
+async ({selectors, timeout, place}) => {
+    const byXPath = (xpath) => {
+        try {
+            return document.evaluate(xpath, document, null,
+                XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        } catch (e) { return null; }
+    };
+    const text = (node) => node ? node.innerText.trim() : '';
+    const ariaLabel = (prefix) => {
+        for (const button of document.querySelectorAll('button[aria-label]')) {
+            const label = button.getAttribute('aria-label');
+            if (label.toLowerCase().startsWith(prefix)
+                && !label.includes('Send to phone') && !label.includes('Copy website')) {
+                return label;
+            }
+        }
+        return '';
+    };
+
+    // Ready once the panel no longer shows the previous listing: its title
+    // changed, or (consecutive listings with the same name) the panel was
+    // re-rendered with other details and the URL points at the clicked card.
+    // The URL alone is not enough: it changes before the panel does.
+    const previous = window.__gmapsListing;
+    const ready = () => {
+        const node = byXPath(selectors.title_xpath);
+        const title = text(node);
+        if (!title) return false;
+        if (!previous || title !== previous.title) return true;
+        const rerendered = node !== previous.node
+            || ariaLabel('address:') !== previous.address || ariaLabel('phone') !== previous.phone;
+        return Boolean(rerendered && place && location.href.includes(place));
+    };
+    const started = Date.now();
+    while (!ready() && Date.now() - started < timeout) {
+        await new Promise((resolve) => setTimeout(resolve, 50));
+    }
+    const waited = Date.now() - started;
+
+    const website = document.querySelector(selectors.website_link);
+    const titleNode = byXPath(selectors.title_xpath);
+    if (ready()) {
+        window.__gmapsListing = {node: titleNode, title: text(titleNode),
+                                 address: ariaLabel('address:'), phone: ariaLabel('phone')};
+    }
+    return {
+        waited: waited,
+        ready: ready(),
+        title: text(titleNode),
+        category: text(byXPath(selectors.category_xpath)),
+        rating: text(byXPath(selectors.rating_xpath)),
+        reviews: text(byXPath(selectors.reviews_xpath)),
+        website: website ? (website.getAttribute('href') || '') : '',
+        address: ariaLabel('address:'),
+        phone: ariaLabel('phone'),
+    };
+}
+"""
+
+# Incremental feed harvesting. INIT installs a MutationObserver that tags every
+# new result card with data-gmaps-idx and queues it once (keyed by place URL or
+# aria-label; a re-rendered card gets its old index back). TAKE drains the
+# queue, scrolls the feed to its end to load more, and reports the end marker.
+HARVEST_INIT_JS = """
+(selector) => {
+    if (window.__gmapsHarvest) window.__gmapsHarvest.observer.disconnect();
+    const state = {ids: new Map(), queue: [], next: 0};
+    const consider = (card) => {
+        if (card.dataset.gmapsIdx) return;
+        const id = card.getAttribute('href') || card.getAttribute('aria-label') || '';
+        if (!id) return;
+        if (state.ids.has(id)) {
+            card.dataset.gmapsIdx = String(state.ids.get(id));
+            return;
+        }
+        state.ids.set(id, state.next);
+        card.dataset.gmapsIdx = String(state.next);
+        state.queue.push({index: state.next++, href: card.getAttribute('href') || ''});
+    };
+    state.observer = new MutationObserver((records) => {
+        for (const record of records) {
+            for (const node of record.addedNodes) {
+                if (node.nodeType !== 1) continue;
+                if (node.matches(selector)) consider(node);
+                node.querySelectorAll(selector).forEach(consider);
+            }
+        }
+    });
+    state.observer.observe(document.body, {childList: true, subtree: true});
+    document.querySelectorAll(selector).forEach(consider);
+    window.__gmapsHarvest = state;
+}
+"""
+
+HARVEST_TAKE_JS = """
+() => {
+    const state = window.__gmapsHarvest;
+    const cards = state.queue.splice(0);
+    const last = document.querySelector(`[data-gmaps-idx="${state.next - 1}"]`);
+    const feed = document.querySelector('div[role="feed"]');
+    if (feed) feed.scrollTop = feed.scrollHeight;
+    else if (last) last.scrollIntoView({block: 'end'});
+    return {cards: cards, ended: document.body.textContent.includes('end of the list')};
+}
+"""
+
+# True once new cards are queued or the feed has reached its end
+HARVEST_PENDING_JS = """
+() => window.__gmapsHarvest.queue.length > 0
+    || document.body.textContent.includes('end of the list')
+"""
+
+# Output columns: Google Sheets header -> BusinessLeadRecord attribute
+RECORD_COLUMNS = {
+    'Keyword': 'keyword',
+    'Category': 'business_category',
+    'Title': 'business_name',
+    'State': 'business_state',
+    'City': 'business_city',
+    'Address': 'business_address',
+    'Website': 'business_website',
+    'Email': 'business_email',
+    'Phone': 'business_phone',
+    'Rating': 'rating',
+    'Total Reviews': 'review_count',
+    'Domain': 'domain',
+    'Valid URL': 'valid_url',
+    'ZIP': 'business_zip',
+}
+
+# Fields of a streamed record (OUTPUT in the module docstring), in file order
+STREAM_FIELDS = (
+    'business_name', 'business_address', 'business_city', 'business_state', 'business_phone',
+    'business_website', 'business_email', 'business_category', 'rating', 'review_count',
+    'business_zip',
+)
+
+# Contact discovery: URL path / link text keyword -> priority score
+CONTACT_KEYWORDS = {
+    'contact': 100, 'kontakt': 100, 'contacto': 100, 'contatti': 100,
+    'impressum': 90, 'imprint': 90, 'mentions-legales': 85,
+    'get-in-touch': 85, 'reach-us': 80, 'email': 80,
+    'about': 60, 'team': 55, 'staff': 50, 'people': 45, 'leadership': 40,
+    'support': 35, 'help': 25, 'legal': 20, 'privacy': 10,
+}
+
+# Common paths tried even if no link points to them: (path, keyword, score)
+CONTACT_COMMON_PATHS = (
+    ('/contact', 'contact', 70),
+    ('/contact-us', 'contact', 65),
+    ('/about', 'about', 40),
+    ('/impressum', 'impressum', 30),
+)
+
 # US State Abbreviation Map
 US_STATES = {
     'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas',
@@ -105,12 +440,199 @@ US_STATES = {
     'WI': 'Wisconsin', 'WY': 'Wyoming'
 }
 
+# State abbreviation or name (any case) -> full state name
+STATE_NAMES = {**{abbrev.lower(): name for abbrev, name in US_STATES.items()},
+               **{name.lower(): name for name in US_STATES.values()}}
+
+# "..., City, ST 12345[, USA]" at the end of a Maps address
+ADDRESS_REGEX = (r'(?:^|,)\s*(?P<city>[^,]+?)\s*,\s*(?P<state>[A-Za-z][A-Za-z .]*?)'
+                 r'(?:\s+(?P<zip>\d{5}(?:-\d{4})?))?\s*(?:,\s*(?:USA|United States))?\s*$')
+
 # Email domains to exclude (placeholders, platforms, etc.)
 EMAIL_EXCLUSIONS = ['example.com', 'domain.com', 'wixpress.com', 'squarespace.com']
 
 # File extensions that are NOT emails (false positive prevention)
 FILE_EXTENSIONS = ['png', 'jpg', 'jpeg', 'pdf', 'js', 'html', 'css', 'svg', 'webp', 'gif']
 
+# Precompiled email patterns and set-based lookups used on the hot path
+EMAIL_PATTERN = re.compile(EMAIL_REGEX)
+EMAIL_SCAN_PATTERN = re.compile(r"(?i:mailto:)([^\"'\s<>?#]+)|(" + EMAIL_REGEX + ")")
+EMAIL_SCAN_PATTERN_BYTES = re.compile(EMAIL_SCAN_PATTERN.pattern.encode())
+MAILTO_SEPARATORS = re.compile(r'[,;&]')   # mailto:a@x.com,b@x.com&amp;cc=... -> one part each
+EMAIL_EXCLUSION_SET = frozenset(EMAIL_EXCLUSIONS)
+FILE_EXTENSION_SET = frozenset(FILE_EXTENSIONS)
+EMAIL_SCAN_MAX_BYTES = 2 * 1024 * 1024     # Only the first 2 MB of a page are scanned
+
+# Browser family and major version inside a User-Agent string
+UA_BROWSER_REGEX = re.compile(r"(Edg|OPR|Chrome|Firefox|Version)/(\d+)")
+UA_PLATFORMS = (("Windows", "Windows"), ("Macintosh", "macOS"), ("Linux", "Linux"))
+
+# Maps feature id inside a place URL ("...!1s0x89c259a61c75684f:0x79d31adb123348d2!...")
+PLACE_ID_REGEX = re.compile(r'!1s(0x[0-9a-f]+:0x[0-9a-f]+)')
+NON_ALNUM_REGEX = re.compile(r'[^a-z0-9]+')
+
+# Hostname of a URL with or without scheme ("https://www.x.com/a", "x.com", "user@x.com:80")
+HOST_REGEX = r'^\s*(?:[a-zA-Z][a-zA-Z0-9+.-]*://)?(?:[^@/?#]*@)?(?P<host>[^/?#:\s]*)'
+HOST_PATTERN = re.compile(HOST_REGEX)
+TLD_CACHE_SIZE = 65536   # Hostnames whose registered domain is memoized
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# TELEMETRY
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+class _Span:
+    __slots__ = ('telemetry', 'name', 'started')
+
+    def __init__(self, telemetry, name):
+        self.telemetry = telemetry
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.telemetry.observe(self.name, time.perf_counter() - self.started)
+        if exc_type is not None and not issubclass(exc_type, asyncio.CancelledError):
+            self.telemetry.count('errors_total', where=self.name)
+        return False
+
+
+class Telemetry:
+    """
+    In-process metrics: span durations and labelled counters.
+
+    span() times a block (sync or async) and counts it as an error if it
+    raises. Each span keeps count, sum and a reservoir sample for p50/p95/p99;
+    everything can be exported as Prometheus text or JSON.
+    """
+
+    def __init__(self, enabled=TELEMETRY_ENABLED, reservoir=TELEMETRY_RESERVOIR):
+        self.enabled = enabled
+        self.reservoir = reservoir
+        self.spans = {}
+        self.counters = {}
+
+    def span(self, name):
+        return _Span(self, name) if self.enabled else contextlib.nullcontext()
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        stats = self.spans.get(name)
+        if stats is None:
+            stats = self.spans[name] = [0, 0.0, []]
+        stats[0] += 1
+        stats[1] += seconds
+        samples = stats[2]
+        if len(samples) < self.reservoir:
+            samples.append(seconds)
+        else:
+            slot = random.randrange(stats[0])
+            if slot < self.reservoir:
+                samples[slot] = seconds
+
+    def count(self, name, value=1, **labels):
+        if self.enabled:
+            key = (name, tuple(sorted(labels.items())))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self):
+        """{'spans': {name: count/sum/p50/p95/p99}, 'counters': [...]}."""
+        spans = {}
+        for name, (count, total, samples) in sorted(self.spans.items()):
+            ordered = sorted(samples)
+            spans[name] = {'count': count, 'sum': total, **{
+                f'p{q}': ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+                for q in (50, 95, 99)
+            }}
+        counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.items())]
+        return {'spans': spans, 'counters': counters}
+
+    def to_prometheus(self):
+        summary = self.summary()
+        lines = ['# TYPE gmaps_span_seconds summary']
+        for name, stats in summary['spans'].items():
+            for q in (50, 95, 99):
+                lines.append(f'gmaps_span_seconds{{span="{name}",quantile="{q / 100}"}} {stats[f"p{q}"]:.6f}')
+            lines.append(f'gmaps_span_seconds_sum{{span="{name}"}} {stats["sum"]:.6f}')
+            lines.append(f'gmaps_span_seconds_count{{span="{name}"}} {stats["count"]}')
+        for name in sorted({c['name'] for c in summary['counters']}):
+            lines.append(f'# TYPE gmaps_{name} counter')
+            for counter in (c for c in summary['counters'] if c['name'] == name):
+                labels = ','.join(f'{k}="{v}"' for k, v in counter['labels'].items())
+                lines.append(f'gmaps_{name}{{{labels}}} {counter["value"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    async def serve(self, port, host='127.0.0.1'):
+        """Serve /metrics (Prometheus text) until the returned runner is cleaned up."""
+        from aiohttp import web
+
+        async def metrics(request):
+            return web.Response(text=self.to_prometheus(), content_type='text/plain')
+
+        app = web.Application()
+        app.router.add_get('/metrics', metrics)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        print(f"Metrics on http://{host}:{port}/metrics")
+        return runner
+
+    def report(self):
+        return ', '.join(
+            f"{name} n={stats['count']} p50={stats['p50'] * 1000:.1f}ms p95={stats['p95'] * 1000:.1f}ms"
+            for name, stats in self.summary()['spans'].items()
+        )
+
+
+telemetry = Telemetry()
+_PROFILING = False
+
+
+@contextlib.contextmanager
+def profile_city(name, mode=PROFILE_CITIES):
+    """
+    Profile one city with cProfile (.prof) or pyinstrument (.html) into PROFILE_DIR.
+
+    Only one city is profiled at a time; cities starting while a profile is
+    running are not profiled.
+    """
+    global _PROFILING
+    if not mode or _PROFILING:
+        yield
+        return
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, re.sub(r'\W+', '_', name).strip('_'))
+    if mode == 'pyinstrument':
+        from pyinstrument import Profiler
+        profiler = Profiler(async_mode='enabled')
+        profiler.start()
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    _PROFILING = True
+    try:
+        yield
+    finally:
+        _PROFILING = False
+        if mode == 'pyinstrument':
+            profiler.stop()
+            with open(path + '.html', 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+        else:
+            profiler.disable()
+            profiler.dump_stats(path + '.prof')
+        print(f"Profile written to {path}")
+
 # ═══════════════════════════════════════════════════════════════════════════════════
 # HELPER FUNCTIONS - DOMAIN & URL
 # ═══════════════════════════════════════════════════════════════════════════════════
@@ -124,10 +646,36 @@ def extract_domain(url):
     return domain
 
 
-def clean_url(url):
-    """Extract just domain.tld from a URL using tldextract."""
+def normalize_url(url):
+    """Normalize a URL for cache keys: lowercase host, no fragment, sorted query."""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower() or "https"
+    netloc = parsed.netloc.lower()
+    if (scheme, netloc.rsplit(":", 1)[-1]) in (("http", "80"), ("https", "443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_")
+    ))
+    return urlunparse((scheme, netloc, parsed.path or "/", "", query, ""))
+
+
+_TLD_EXTRACT = None
+
+
+def tld_extractor():
+    """Process-wide tldextract instance (the public suffix list is loaded once)."""
+    global _TLD_EXTRACT
+    if _TLD_EXTRACT is None:
+        _TLD_EXTRACT = tldextract.TLDExtract()
+    return _TLD_EXTRACT
+
+
+@functools.lru_cache(maxsize=TLD_CACHE_SIZE)
+def registered_domain(host):
+    """domain.tld of a hostname, or None; memoized per host."""
     try:
-        extracted = tldextract.extract(url)
+        extracted = tld_extractor()(host)
         if not extracted.domain or not extracted.suffix:
             return None
         return f"{extracted.domain}.{extracted.suffix}"
@@ -135,452 +683,2608 @@ def clean_url(url):
         return None
 
 
-def validate_domain(domain):
-    """Try different URL formats until one works, return valid URL or None."""
-    if not domain or ".." in domain:
+def site_host(url):
+    """
+    Lowercase hostname of a URL without "www.", or None.
+
+    Emails found on a website are shared by this key, not the registered
+    domain: joe.wixsite.com and acme.wixsite.com are different businesses.
+    """
+    if not isinstance(url, str):
         return None
+    return HOST_PATTERN.match(url).group('host').lower().removeprefix('www.') or None
 
-    prefixes = ["https://", "http://"]
-    subdomains = ["www.", ""]
 
-    for prefix in prefixes:
-        for subdomain in subdomains:
-            url = f"{prefix}{subdomain}{domain}"
-            try:
-                ua = UserAgent()
-                headers = {'User-Agent': ua.random}
-                response = requests.get(url=url, headers=headers, timeout=20)
-                
-                # If blocked, try ScraperAPI
-                if '4' in str(response.status_code):
-                    url_ = f'http://api.scraperapi.com?api_key={SCRAPERAPI_KEY}&url={url}'
-                    response = requests.get(url_, timeout=20)
-
-                if response.status_code == 200:
-                    return url
-            except requests.RequestException:
-                pass
-    return None
+def clean_url(url):
+    """Extract just domain.tld from a URL using tldextract."""
+    if not isinstance(url, str):
+        return None
+    return registered_domain(HOST_PATTERN.match(url).group(1).lower())
+
 
 # ═══════════════════════════════════════════════════════════════════════════════════
-# HELPER FUNCTIONS - EMAIL EXTRACTION
+# HELPER FUNCTIONS - PAGE CACHE
 # ═══════════════════════════════════════════════════════════════════════════════════
 
-def is_valid_email(email):
-    """Check if email passes our validation rules."""
-    if not email or not re.match(EMAIL_REGEX, email):
-        return False
-    
-    # Reject if starts with digit
-    if email[0].isdigit():
-        return False
-    
-    # Reject excluded domains
-    for exclusion in EMAIL_EXCLUSIONS:
-        if exclusion in email.lower():
-            return False
-    
-    # Reject file extensions masquerading as emails
-    extension = email.split('.')[-1].lower()
-    if extension in FILE_EXTENSIONS:
-        return False
-    
-    return True
+class PageCache:
+    """
+    On-disk HTTP page cache keyed by normalized URL.
 
+    Bodies are zlib-compressed and stored by content hash, so identical pages
+    (franchise templates, shared contact pages) are kept once. Stale entries are
+    revalidated with If-None-Match / If-Modified-Since; the least recently used
+    entries are evicted once the cache grows past max_bytes.
 
-def extract_emails(text):
-    """Extract all valid emails from HTML text."""
-    emails = set()
-    soup = BeautifulSoup(text, 'lxml')
+    Counters: hits (served from disk without a request), misses (a request was
+    made), revalidated (misses answered with 304 Not Modified), evictions.
+    """
 
-    # Extract from mailto: links
-    for link in soup.find_all("a", href=True):
-        href = link["href"]
-        if href.startswith("mailto:"):
-            email = href[7:]
-            email = email.split('?')[0].split('#')[0]
-            email = unquote(email).strip()
-            if is_valid_email(email):
-                emails.add(email)
+    def __init__(self, directory=None, ttl=PAGE_CACHE_TTL, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.directory = directory or os.path.join(CACHE_DIR, "pages")
+        os.makedirs(self.directory, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
 
-    # Extract via regex from full text
-    regex_emails = re.findall(EMAIL_REGEX, text)
-    for email in regex_emails:
-        email = unquote(email).strip()
-        if is_valid_email(email):
-            emails.add(email)
+        self.conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, digest TEXT, status INTEGER, etag TEXT, "
+            "last_modified TEXT, fetched_at REAL, accessed_at REAL, size INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
 
-    return emails
+    def _body_path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest + ".zz")
 
+    def _read_body(self, digest):
+        try:
+            with open(self._body_path(digest), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except (OSError, zlib.error):
+            return None
 
-def crawl_contact_page(url):
-    """Fetch a single contact page and extract emails."""
-    emails = set()
-    try:
-        if not url.startswith(("http://", "https://")):
-            url = "https://" + url
-        
-        ua = UserAgent()
-        headers = {"User-Agent": ua.random}
-        response = requests.get(url, headers=headers, timeout=20)
-
-        # Fallback to ScraperAPI if blocked
-        if response.status_code not in [200, '200']:
-            response = requests.get(
-                f"https://api.scraperapi.com?api_key={SCRAPERAPI_KEY}&url={url}",
-                timeout=20
-            )
-        
-        emails.update(extract_emails(response.text))
-    except (requests.RequestException, ValueError):
-        pass
-    return emails
+    def lookup(self, url):
+        """
+        Return (text, conditional_headers).
 
+        text is set on a fresh hit. Otherwise text is None and the headers hold
+        the validators to send with the request (empty if nothing is cached).
+        """
+        key = normalize_url(url)
+        row = self.conn.execute(
+            "SELECT digest, etag, last_modified, fetched_at FROM pages WHERE url = ?", (key,)
+        ).fetchone()
+        if row:
+            digest, etag, last_modified, fetched_at = row
+            if time.time() - fetched_at <= self.ttl:
+                text = self._read_body(digest)
+                if text is not None:
+                    self.hits += 1
+                    self.conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), key))
+                    self.conn.commit()
+                    return text, {}
 
-def crawl_footer_links(domain, url):
-    """Crawl a website's footer and contact pages for emails."""
-    emails = set()
-    
-    try:
-        ua = UserAgent()
-        headers = {"User-Agent": ua.random}
-        response = requests.get(url, headers=headers, timeout=20)
-
-        if response.status_code not in [200, '200']:
-            response = requests.get(
-                f"https://api.scraperapi.com?api_key={SCRAPERAPI_KEY}&url={url}",
-                timeout=20
-            )
+        self.misses += 1
+        headers = {}
+        if row and row[1]:
+            headers["If-None-Match"] = row[1]
+        if row and row[2]:
+            headers["If-Modified-Since"] = row[2]
+        return None, headers
 
-    except (requests.RequestException, ValueError) as e:
-        print(f"Error fetching {url}: {e}")
-        return list(emails)
+    def refresh(self, url):
+        """Mark an entry as revalidated (304) and return its cached text."""
+        key = normalize_url(url)
+        row = self.conn.execute("SELECT digest FROM pages WHERE url = ?", (key,)).fetchone()
+        text = self._read_body(row[0]) if row else None
+        if text is not None:
+            self.revalidated += 1
+            now = time.time()
+            self.conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, key))
+            self.conn.commit()
+        return text
 
-    soup = BeautifulSoup(response.text, "lxml")
-    emails.update(extract_emails(response.text))
+    def store(self, url, status, text, etag=None, last_modified=None):
+        """Save a response body and its validators."""
+        body = text.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._body_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(zlib.compress(body, 6))
+            os.replace(tmp, path)
+        size = os.path.getsize(path)
 
-    # Crawl footer links
-    footer = soup.find("footer")
-    if footer:
-        for link in footer.find_all("a", href=True):
-            if domain not in link['href']:
-                next_url = urljoin(url, link["href"])
-            else:
-                next_url = link["href"]
-            
-            if next_url.startswith(url) and next_url != url:
-                try:
-                    linked_response = requests.get(next_url, timeout=20)
-                    linked_response.raise_for_status()
-                    emails.update(extract_emails(linked_response.text))
-                except (requests.RequestException, ValueError):
-                    pass
+        key = normalize_url(url)
+        old = self.conn.execute("SELECT digest, size FROM pages WHERE url = ?", (key,)).fetchone()
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, digest, status, etag, last_modified, now, now, size),
+        )
+        self.total_bytes += size - (old[1] if old else 0)
+        if old and old[0] != digest:
+            self._drop_body(old[0])
+        self.conn.commit()
 
-    # Find and crawl contact pages
-    for link in soup.find_all("a", href=True):
-        href = link["href"]
-        if "contact" in href.lower():
-            if domain not in href:
-                contact_url = urljoin(url, href)
-            else:
-                contact_url = href
-            emails.update(crawl_contact_page(contact_url))
+        if self.total_bytes > self.max_bytes:
+            self.evict()
 
-    return list(emails)
+    def forget(self, url):
+        """Remove one entry (used when its body file has gone missing)."""
+        key = normalize_url(url)
+        row = self.conn.execute("SELECT digest, size FROM pages WHERE url = ?", (key,)).fetchone()
+        if row:
+            self.conn.execute("DELETE FROM pages WHERE url = ?", (key,))
+            self._drop_body(row[0])
+            self.total_bytes -= row[1]
+            self.conn.commit()
 
+    def _drop_body(self, digest):
+        """Delete a body file once no URL points at it any more."""
+        if not self.conn.execute("SELECT 1 FROM pages WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            try:
+                os.remove(self._body_path(digest))
+            except OSError:
+                pass
 
-def process_website(website):
-    """Process a website URL to extract emails."""
-    if pd.notna(website) and 'google' not in website and 'facebook' not in website:
-        start_url = website.strip()
-        domain = extract_domain(start_url)
+    def evict(self):
+        """Drop least recently used entries until the cache is at 90% of max_bytes."""
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT url, digest, size FROM pages ORDER BY accessed_at").fetchall()
+        for url, digest, size in rows:
+            if self.total_bytes <= target:
+                break
+            self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._drop_body(digest)
+            self.total_bytes -= size
+            self.evictions += 1
+        self.conn.commit()
 
-        if not start_url.startswith(("http://", "https://")):
-            start_url = "https://" + domain
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'evictions': self.evictions,
+            'bytes': self.total_bytes,
+        }
 
-        try:
-            emails = crawl_footer_links(domain, start_url)
-            return '\n'.join(emails)
-        except Exception as e:
-            print(f"Error processing {start_url}: {e}")
-            return None
-    return None
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
 
 # ═══════════════════════════════════════════════════════════════════════════════════
-# HELPER FUNCTIONS - GOOGLE MAPS PARSING
+# HELPER FUNCTIONS - HOST POLITENESS & SCRAPERAPI BUDGET
 # ═══════════════════════════════════════════════════════════════════════════════════
 
-def aria_label(buttons):
-    """Extract aria-label text from button elements, filtering out irrelevant ones."""
-    for button in buttons:
-        if 'aria-label' in button.attrs:
-            text = button['aria-label']
-            if 'Send to phone' not in text and 'Copy website' not in text:
-                return text
-    return ""
+class ScraperApiBudget:
+    """Caps paid ScraperAPI fallback calls and tracks their spend."""
 
-# ═══════════════════════════════════════════════════════════════════════════════════
-# GOOGLE SHEETS INTEGRATION (Optional - Replace with your own storage)
-# ═══════════════════════════════════════════════════════════════════════════════════
+    def __init__(self, max_calls=SCRAPERAPI_BUDGET, credits_per_call=SCRAPERAPI_CREDITS_PER_CALL):
+        self.max_calls = max_calls
+        self.credits_per_call = credits_per_call
+        self.calls = 0
+        self.successes = 0
+        self.denied = 0
 
-def setup_google_sheets():
-    """Authenticate with Google Sheets. For Colab use."""
-    try:
-        from google.colab import auth
-        auth.authenticate_user()
-        
-        import gspread
-        from google.auth import default
-        
-        creds, _ = default()
-        client = gspread.authorize(creds)
-        return client
-    except ImportError:
-        print("Not running in Colab - Google Sheets disabled")
-        return None
+    def exhausted(self):
+        """True once the budget is used up (spend() would be denied)."""
+        return self.max_calls is not None and self.calls >= self.max_calls
 
+    def spend(self):
+        """Reserve one fallback call; False once the budget is used up."""
+        if self.exhausted():
+            self.denied += 1
+            return False
+        self.calls += 1
+        return True
 
-def google_sheets_get_record(client, sheet_name='States and Cities'):
-    """Read records from a Google Sheet."""
-    if not client:
-        return pd.DataFrame()
-    sh = client.open_by_key(GOOGLE_SHEET_ID)
-    worksheet = sh.worksheet(sheet_name)
-    return pd.DataFrame(worksheet.get_all_records())
+    def report(self, since=0):
+        calls = self.calls - since
+        limit = '' if self.max_calls is None else f" (budget {self.calls}/{self.max_calls})"
+        return (f"{calls} calls, {calls * self.credits_per_call} credits, "
+                f"{self.successes} succeeded, {self.denied} denied{limit}")
 
 
-def write_in_row(client, batch_data):
-    """Write batch data to the scrapedResults sheet."""
-    if not client:
-        print("Google Sheets not configured - data not saved")
-        return
-    
-    sh = client.open_by_key(GOOGLE_SHEET_ID)
-    worksheet = sh.worksheet('scrapedResults')
+class SiteBudget:
+    """Visited-URL dedup and page budget for crawling one website."""
 
-    last_row = len(worksheet.get_all_values())
-    row_start = last_row + 1
+    def __init__(self, max_pages=SITE_PAGE_BUDGET):
+        self.max_pages = max_pages
+        self.visited = set()
 
-    num_rows = len(batch_data)
-    cell_range = f'A{row_start}:M{row_start + num_rows - 1}'
+    def claim(self, url):
+        """True if url is new for this site and the page budget allows fetching it."""
+        key = url.split('#', 1)[0].rstrip('/').lower()
+        if key in self.visited:
+            return False
+        if self.max_pages is not None and len(self.visited) >= self.max_pages:
+            return False
+        self.visited.add(key)
+        return True
 
-    worksheet.update(range_name=cell_range, values=batch_data)
-    print('Written to Google Sheets')
 
+class _HostState:
+    __slots__ = ('limit', 'next_start', 'failures', 'open_until')
 
-def write_in_cell(client, row, value):
-    """Update a single cell in States and Cities sheet."""
-    if not client:
-        return
-    sh = client.open_by_key(GOOGLE_SHEET_ID)
-    worksheet = sh.worksheet('States and Cities')
-    worksheet.update_cell(row, 4, value)
+    def __init__(self, concurrency):
+        self.limit = asyncio.Semaphore(concurrency)
+        self.next_start = 0.0
+        self.failures = 0
+        self.open_until = 0.0
 
-# ═══════════════════════════════════════════════════════════════════════════════════
-# MAIN SCRAPER LOGIC
-# ═══════════════════════════════════════════════════════════════════════════════════
 
-async def run(playwright, state, city, country, keywords=None, client=None):
+class HostScheduler:
     """
-    Main scraping function. Navigates Google Maps, extracts business data,
-    and crawls websites for emails.
-    
-    Args:
-        playwright: Playwright instance
-        state: US state name or abbreviation
-        city: City name
-        country: Country (usually "USA")
-        keywords: List of search keywords (default: ["Venture Capital Company"])
-        client: Google Sheets client (optional)
-    
-    Returns:
-        List of business records
+    Per-host politeness shared by every crawl and domain probe.
+
+    slot() caps requests in flight per host and spaces their start times;
+    record() feeds a circuit breaker that skips hosts after repeated errors,
+    403s, 429s or 5xx for a cooldown. Paid ScraperAPI fallbacks go through
+    the shared ScraperApiBudget.
     """
-    if keywords is None:
-        keywords = ["Venture Capital Company"]
-    
-    df = pd.DataFrame(columns=[
-        'Keyword', 'Category', 'Title', 'State', 'City', 
-        'Address', 'Website', 'Email', 'Phone', 'Rating', 
-        'Total Reviews', 'Domain', 'Valid URL'
-    ])
-    
-    data = []
 
-    browser = await playwright.chromium.launch(headless=True)
-    context = await browser.new_context()
-    page = await context.new_page()
-    page.set_default_timeout(30000)
+    def __init__(self, concurrency=HOST_MAX_CONCURRENCY, min_interval=HOST_MIN_INTERVAL,
+                 site_pages=SITE_PAGE_BUDGET, breaker_failures=BREAKER_FAILURES,
+                 breaker_cooldown=BREAKER_COOLDOWN, fallback_budget=None):
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.site_pages = site_pages
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.fallback = fallback_budget or ScraperApiBudget()
+        self.hosts = {}
+        self.requests = 0
+        self.skipped = 0
+        self.trips = 0
 
-    for keyword in keywords:
-        try:
-            print(f'{keyword} - {city} - {state}', end=' - ')
+    def _host(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = _HostState(self.concurrency)
+        return state
 
-            # Navigate to Google Maps
-            await page.goto("https://www.google.com/maps?hl=en")
-            await asyncio.sleep(2)
+    def site(self):
+        return SiteBudget(self.site_pages)
 
-            # Handle consent dialog
-            try:
-                page.set_default_timeout(3000)
-                await page.get_by_role("button", name="Accept all").click()
-            except:
-                pass
+    def is_open(self, url):
+        """True while the host's circuit is open (the request should be skipped)."""
+        state = self.hosts.get(urlparse(url).hostname)
+        if state and time.monotonic() < state.open_until:
+            self.skipped += 1
+            return True
+        return False
 
-            page.set_default_timeout(15000)
+    @contextlib.asynccontextmanager
+    async def slot(self, url):
+        state = self._host(urlparse(url).hostname)
+        async with state.limit:
+            now = time.monotonic()
+            start = max(now, state.next_start)
+            state.next_start = start + self.min_interval
+            if start > now:
+                await asyncio.sleep(start - now)
+            self.requests += 1
+            yield
 
-            content = await page.content()
-            if 'Search Google Maps' not in content:
-                continue
-            print('Browser launched', end=' - ')
+    def record(self, url, status):
+        """Feed a response status (None for network errors) to the host's breaker."""
+        state = self._host(urlparse(url).hostname)
+        if status is None or status in (403, 429) or status >= 500:
+            state.failures += 1
+            # Stays at the threshold, so one more failure after the cooldown reopens it
+            if state.failures >= self.breaker_failures:
+                state.open_until = time.monotonic() + self.breaker_cooldown
+                self.trips += 1
+        else:
+            state.failures = 0
+            state.open_until = 0.0
 
-            await asyncio.sleep(2)
+    def report(self):
+        return (f"{self.requests} requests to {len(self.hosts)} hosts, "
+                f"{self.trips} circuit trips, {self.skipped} skipped; "
+                f"ScraperAPI: {self.fallback.report()}")
 
-            # Type search query with human-like delay
-            await page.locator(SELECTORS['search_input']).type(
-                f"{keyword} near {city} {state} {country}", 
-                delay=200
-            )
-            await asyncio.sleep(3)
-            await page.locator(SELECTORS['search_input']).press("Enter")
-            await asyncio.sleep(3)
-            print('Search made', end=' - ')
+# ═══════════════════════════════════════════════════════════════════════════════════
+# HELPER FUNCTIONS - HEADER PROFILES
+# ═══════════════════════════════════════════════════════════════════════════════════
 
-            # Scroll through results until end
-            errors = 0
-            while True:
-                query = await page.query_selector_all(SELECTORS['result_cards'])
+class HeaderProfile:
+    """One coherent browser identity: User-Agent plus the headers that browser sends."""
 
-                if len(query) <= 1:
-                    break
+    __slots__ = ('user_agent', 'family', 'version', 'platform', 'language', 'headers')
 
-                try:
-                    await query[-1].click()
-                except Exception:
-                    errors += 1
-                    pass
-                await asyncio.sleep(1)
+    def __init__(self, user_agent, language):
+        self.user_agent = user_agent
+        versions = dict(UA_BROWSER_REGEX.findall(user_agent))
+        if 'Edg' in versions:
+            self.family, self.version = 'Edge', versions['Edg']
+        elif 'OPR' in versions:
+            self.family, self.version = 'Opera', versions['OPR']
+        elif 'Chrome' in versions:
+            self.family, self.version = 'Chrome', versions['Chrome']
+        elif 'Firefox' in versions:
+            self.family, self.version = 'Firefox', versions['Firefox']
+        else:
+            self.family, self.version = 'Safari', versions.get('Version', '')
+        self.platform = next((name for token, name in UA_PLATFORMS if token in user_agent), 'Windows')
+        self.language = language
 
-                if errors > 5:
+        self.headers = {
+            "User-Agent": user_agent,
+            "Accept": ("text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,"
+                       "image/webp,image/apng,*/*;q=0.8" if self.chromium else
+                       "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"),
+            "Accept-Language": language,
+            **self.client_hints(),
+        }
+
+    @property
+    def chromium(self):
+        return self.family in ('Chrome', 'Edge', 'Opera')
+
+    def client_hints(self):
+        """sec-ch-ua headers (Chromium browsers only)."""
+        if not self.chromium:
+            return {}
+        brand = {'Chrome': 'Google Chrome', 'Edge': 'Microsoft Edge', 'Opera': 'Opera'}[self.family]
+        return {
+            "sec-ch-ua": f'"{brand}";v="{self.version}", "Chromium";v="{self.version}", "Not-A.Brand";v="99"',
+            "sec-ch-ua-mobile": "?0",
+            "sec-ch-ua-platform": f'"{self.platform}"',
+        }
+
+
+class HeaderPool:
+    """
+    Preloaded rotation of HeaderProfiles.
+
+    fake_useragent's data is loaded once, when the pool is built. for_host()
+    keeps one profile per host (so a site sees one consistent visitor) and
+    spreads hosts across the pool; context_options() gives a matching
+    Chromium fingerprint for Playwright contexts.
+    """
+
+    def __init__(self, size=HEADER_POOL_SIZE):
+        from fake_useragent import UserAgent
+        try:
+            source = UserAgent(platforms='desktop')
+        except TypeError:   # fake_useragent < 2.0
+            source = UserAgent()
+        agents = []
+        for _ in range(size * 5):
+            agent = source.random
+            if 'Mobile' not in agent and agent not in agents:
+                agents.append(agent)
+            if len(agents) >= size:
+                break
+        self.profiles = [HeaderProfile(agent, random.choice(ACCEPT_LANGUAGES)) for agent in agents]
+        self.browser_profiles = [p for p in self.profiles if p.family == 'Chrome'] or self.profiles
+        self.hosts = {}
+
+    def random(self):
+        return random.choice(self.profiles).headers
+
+    def for_host(self, host):
+        profile = self.hosts.get(host)
+        if profile is None:
+            profile = self.hosts[host] = random.choice(self.profiles)
+        return profile.headers
+
+    def context_options(self):
+        """new_context() options for a random Chrome profile (UA, locale, viewport, headers)."""
+        profile = random.choice(self.browser_profiles)
+        width, height = random.choice(VIEWPORTS)
+        return {
+            'user_agent': profile.user_agent,
+            'locale': profile.language.split(',')[0],
+            'viewport': {'width': width, 'height': height},
+            'extra_http_headers': {"Accept-Language": profile.language, **profile.client_hints()},
+        }
+
+
+_HEADER_POOL = None
+
+
+def header_pool():
+    """The process-wide HeaderPool, built on first use."""
+    global _HEADER_POOL
+    if _HEADER_POOL is None:
+        _HEADER_POOL = HeaderPool()
+    return _HEADER_POOL
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# HELPER FUNCTIONS - ASYNC HTTP CLIENT
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+def create_http_session(resolver=None):
+    """Create the shared, connection-pooled aiohttp session for website crawling."""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_MAX_CONNECTIONS,
+        limit_per_host=HTTP_MAX_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE,
+        ttl_dns_cache=300,
+        resolver=resolver,
+    )
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+def random_headers(url=None):
+    """Request headers from the shared HeaderPool: sticky per host when url is given."""
+    pool = header_pool()
+    return pool.for_host(urlparse(url).hostname) if url else pool.random()
+
+
+async def scraperapi_get(session, url, scheduler=None, read=True):
+    """
+    Fetch url through ScraperAPI; returns (status, text) or (None, '').
+
+    With a scheduler the call is only made while its budget allows it.
+    """
+    if scheduler and not scheduler.fallback.spend():
+        return None, ''
+    try:
+        with telemetry.span('http.scraperapi'):
+            async with session.get(
+                "https://api.scraperapi.com",
+                params={'api_key': SCRAPERAPI_KEY, 'url': url},
+            ) as response:
+                status = response.status
+                text = await response.text(errors='replace') if read else ''
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        return None, ''
+    if scheduler and status == 200:
+        scheduler.fallback.successes += 1
+    return status, text
+
+
+async def fetch_text(session, url, headers=None, fallback=True, page_cache=None, scheduler=None):
+    """
+    GET a URL and return (status, text).
+
+    If the site answers with anything but 200 and fallback is enabled, the
+    request is retried once through ScraperAPI. Network errors return (None, '').
+    With a page_cache, fresh pages come from disk and stale ones are revalidated.
+    With a scheduler, the host's politeness limits and circuit breaker apply
+    and the fallback is only used while the ScraperAPI budget allows it.
+    """
+    if page_cache:
+        text, conditional = page_cache.lookup(url)
+        if text is not None:
+            return 200, text
+        headers = {**(headers or {}), **conditional}
+
+    if scheduler and scheduler.is_open(url):
+        return None, ''
+
+    etag = last_modified = None
+    try:
+        async with scheduler.slot(url) if scheduler else contextlib.nullcontext():
+            with telemetry.span('http.fetch'):
+                async with session.get(url, headers=headers) as response:
+                    status = response.status
+                    text = await response.text(errors='replace')
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        if scheduler:
+            scheduler.record(url, None)
+        return None, ''
+    if scheduler:
+        scheduler.record(url, status)
+
+    if status == 304 and page_cache:
+        text = page_cache.refresh(url)
+        if text is not None:
+            return 200, text
+        # Cached body disappeared; drop the entry and fetch it again
+        page_cache.forget(url)
+        headers = {k: v for k, v in headers.items() if not k.startswith('If-')}
+        return await fetch_text(session, url, headers, fallback, page_cache, scheduler)
+
+    if status != 200 and fallback:
+        etag = last_modified = None
+        fallback_status, fallback_text = await scraperapi_get(session, url, scheduler)
+        if fallback_status is not None:
+            status, text = fallback_status, fallback_text
+
+    if status == 200 and page_cache:
+        page_cache.store(url, status, text, etag, last_modified)
+
+    return status, text
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# HELPER FUNCTIONS - DOMAIN VALIDATION
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+class DomainCache:
+    """Persistent domain -> valid URL cache (SQLite) with TTL."""
+
+    def __init__(self, path=None, ttl=DOMAIN_CACHE_TTL, negative_ttl=DOMAIN_CACHE_NEGATIVE_TTL):
+        path = path or os.path.join(CACHE_DIR, "domains.sqlite3")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS domains ("
+            "domain TEXT PRIMARY KEY, valid_url TEXT, checked_at REAL)"
+        )
+
+    def get(self, domain):
+        """Return (hit, valid_url); hit is False when unknown or expired."""
+        row = self.conn.execute(
+            "SELECT valid_url, checked_at FROM domains WHERE domain = ?", (domain,)
+        ).fetchone()
+        if not row:
+            return False, None
+        valid_url, checked_at = row
+        ttl = self.ttl if valid_url else self.negative_ttl
+        if time.time() - checked_at > ttl:
+            return False, None
+        return True, valid_url
+
+    def set(self, domain, valid_url):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO domains (domain, valid_url, checked_at) VALUES (?, ?, ?)",
+            (domain, valid_url, time.time()),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+PROBE_SKIPPED = 'skipped'   # probe_url result when the host's circuit is open
+
+
+async def probe_url(session, url, scheduler=None):
+    """HTTP status of a direct GET of url (None on network errors, PROBE_SKIPPED on an open circuit)."""
+    if scheduler and scheduler.is_open(url):
+        return PROBE_SKIPPED
+    try:
+        async with scheduler.slot(url) if scheduler else contextlib.nullcontext():
+            with telemetry.span('http.probe'):
+                async with session.get(url, headers=random_headers(url)) as response:
+                    status = response.status
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        status = None
+    if scheduler:
+        scheduler.record(url, status)
+    return status
+
+
+async def validate_domain(session, domain, cache=None, scheduler=None):
+    """
+    Race all URL formats of a domain; the first one that answers 200 wins.
+
+    Only the direct probes race. If none answers 200 but one was blocked
+    (4xx), the first blocked format is retried through ScraperAPI: at most
+    one paid call per domain. A domain that couldn't really be checked (open
+    circuit, ScraperAPI budget used up) returns None without being cached, so
+    it is tried again later instead of counting as dead.
+    """
+    if not domain or ".." in domain:
+        return None
+
+    if cache:
+        hit, valid_url = cache.get(domain)
+        if hit:
+            return valid_url
+
+    urls = [
+        f"{prefix}{subdomain}{domain}"
+        for prefix in ["https://", "http://"]
+        for subdomain in ["www.", ""]
+    ]
+    probes = {asyncio.create_task(probe_url(session, url, scheduler)): url for url in urls}
+    statuses = {}
+    valid_url = None
+    try:
+        with telemetry.span('domain.validate'):
+            pending = set(probes)
+            while pending and valid_url is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for probe in done:
+                    statuses[probes[probe]] = probe.result()
+                valid_url = next((url for url in urls if statuses.get(url) == 200), None)
+    finally:
+        for probe in probes:
+            probe.cancel()
+        await asyncio.gather(*probes, return_exceptions=True)
+
+    # Blocked everywhere: one ScraperAPI call (within budget) for the first blocked format
+    skipped = PROBE_SKIPPED in statuses.values()
+    blocked = next((url for url in urls if isinstance(statuses.get(url), int)
+                    and 400 <= statuses[url] < 500), None)
+    if valid_url is None and blocked:
+        if scheduler and scheduler.fallback.exhausted():
+            scheduler.fallback.denied += 1
+            skipped = True
+        else:
+            status, _ = await scraperapi_get(session, blocked, scheduler, read=False)
+            valid_url = blocked if status == 200 else None
+
+    if cache and (valid_url or not skipped):
+        cache.set(domain, valid_url)
+    return valid_url
+
+
+async def validate_domains(session, domains, cache=None, concurrency=VALIDATE_CONCURRENCY,
+                           scheduler=None):
+    """Validate a batch of domains concurrently; returns {domain: valid_url}."""
+    limit = asyncio.Semaphore(concurrency)
+    unique = [d for d in dict.fromkeys(domains) if d]
+
+    async def validate(domain):
+        async with limit:
+            return await validate_domain(session, domain, cache, scheduler)
+
+    results = await asyncio.gather(*(validate(d) for d in unique))
+    return dict(zip(unique, results))
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# HELPER FUNCTIONS - EMAIL EXTRACTION
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+def is_valid_email(email):
+    """Check if email passes our validation rules."""
+    if not email or not EMAIL_PATTERN.fullmatch(email):
+        return False
+    
+    # Reject if starts with digit
+    if email[0].isdigit():
+        return False
+    
+    # Reject excluded domains and their subdomains
+    lowered = email.lower()
+    labels = lowered.rpartition('@')[2].split('.')
+    for i in range(len(labels) - 1):
+        if '.'.join(labels[i:]) in EMAIL_EXCLUSION_SET:
+            return False
+    
+    # Reject file extensions masquerading as emails
+    if lowered.rpartition('.')[2] in FILE_EXTENSION_SET:
+        return False
+    
+    return True
+
+
+def extract_emails(text, max_bytes=EMAIL_SCAN_MAX_BYTES, max_emails=None):
+    """Extract all valid emails from HTML text (timed as the 'email.extract' span)."""
+    with telemetry.span('email.extract'):
+        return _extract_emails(text, max_bytes, max_emails)
+
+
+def _extract_emails(text, max_bytes=EMAIL_SCAN_MAX_BYTES, max_emails=None):
+    """
+    Extract all valid emails from HTML text (str or bytes).
+
+    A single regex pass picks up both mailto: targets and plain-text emails,
+    without building a DOM. Scanning stops after max_bytes, or as soon as
+    max_emails valid addresses were found.
+    """
+    emails = set()
+    if not text:
+        return emails
+
+    # Cheap pre-check: no "@" (plain or URL-encoded) means no email at all
+    if isinstance(text, str):
+        pattern = EMAIL_SCAN_PATTERN
+        if '@' not in text and '%40' not in text:
+            return emails
+    else:
+        pattern = EMAIL_SCAN_PATTERN_BYTES
+        if b'@' not in text and b'%40' not in text:
+            return emails
+
+    for match in pattern.finditer(text, 0, max_bytes):
+        target = match.group(1)
+        found = target if target is not None else match.group(2)
+        if not isinstance(found, str):
+            found = found.decode('utf-8', 'replace')
+        if '%' in found:
+            found = unquote(found)
+
+        # A mailto: target can hold several addresses plus &cc=/&subject= parameters;
+        # keep the address inside each part
+        parts = MAILTO_SEPARATORS.split(found) if target is not None else (found,)
+        for part in parts:
+            address = EMAIL_PATTERN.search(part)
+            if not address:
+                continue
+            email = address.group(0)
+            if email not in emails and is_valid_email(email):
+                emails.add(email)
+                if max_emails and len(emails) >= max_emails:
+                    return emails
+
+    return emails
+
+
+async def crawl_contact_page(session, url, page_cache=None, scheduler=None):
+    """Fetch a single contact page and extract emails."""
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+
+    status, text = await fetch_text(session, url, headers=random_headers(url), page_cache=page_cache,
+                                    scheduler=scheduler)
+    return extract_emails(text) if text else set()
+
+
+async def crawl_linked_page(session, url, page_cache=None, scheduler=None):
+    """Fetch a footer link (no fallback) and extract emails if it loads."""
+    status, text = await fetch_text(session, url, fallback=False, page_cache=page_cache,
+                                    scheduler=scheduler)
+    return extract_emails(text) if status == 200 else set()
+
+
+async def crawl_footer_links(session, domain, url, page_cache=None, scheduler=None):
+    """
+    Crawl a website's footer and contact pages for emails.
+
+    Each URL is fetched at most once, and with a scheduler no more than its
+    per-site page budget is fetched (contact pages are claimed first).
+    Returns None when the homepage can't be fetched.
+    """
+    emails = set()
+    site = scheduler.site() if scheduler else SiteBudget(None)
+    site.claim(url)
+
+    status, text = await fetch_text(session, url, headers=random_headers(url), page_cache=page_cache,
+                                    scheduler=scheduler)
+    if status != 200:
+        print(f"Error fetching {url}")
+        return None
+
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(text, "lxml")
+    emails.update(extract_emails(text))
+
+    # Collect same-site footer links
+    footer_urls = []
+    footer = soup.find("footer")
+    if footer:
+        for link in footer.find_all("a", href=True):
+            if domain not in link['href']:
+                next_url = urljoin(url, link["href"])
+            else:
+                next_url = link["href"]
+
+            if next_url.startswith(url) and next_url != url:
+                footer_urls.append(next_url)
+
+    # Collect contact pages
+    contact_urls = []
+    for link in soup.find_all("a", href=True):
+        href = link["href"]
+        if "contact" in href.lower():
+            if domain not in href:
+                contact_urls.append(urljoin(url, href))
+            else:
+                contact_urls.append(href)
+
+    # Skip repeats and anything past the site's page budget
+    contact_urls = [u for u in contact_urls if site.claim(u)]
+    footer_urls = [u for u in footer_urls if site.claim(u)]
+
+    # Footer and contact pages are fetched at the same time
+    results = await asyncio.gather(
+        *(crawl_linked_page(session, u, page_cache, scheduler) for u in footer_urls),
+        *(crawl_contact_page(session, u, page_cache, scheduler) for u in contact_urls),
+    )
+    for found in results:
+        emails.update(found)
+
+    return list(emails)
+
+
+def rank_contact_links(text, url, domain):
+    """
+    Score the same-site links of a page as contact-page candidates.
+
+    Returns [(score, url, fallback)] best first. Links score by CONTACT_KEYWORDS
+    in their path or text; footer links without a keyword are kept last (score
+    1). CONTACT_COMMON_PATHS are added for keywords no link covered; guesses are
+    never retried through ScraperAPI since they often 404.
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(text, "lxml")
+    footer = soup.find("footer")
+    footer_links = set(map(id, footer.find_all("a", href=True))) if footer else set()
+
+    scores = {}
+    covered = set()
+    for link in soup.find_all("a", href=True):
+        href = link["href"].strip()
+        if href.startswith(('mailto:', 'tel:', 'javascript:', '#')):
+            continue
+        next_url = urljoin(url, href).split('#', 1)[0]
+        host = urlparse(next_url).hostname or ''
+        if not next_url.startswith(('http://', 'https://')) or not (host == domain or host.endswith('.' + domain)):
+            continue
+
+        haystack = (urlparse(next_url).path + ' ' + link.get_text(' ', strip=True)).lower().replace(' ', '-')
+        score, keyword = max(((v, k) for k, v in CONTACT_KEYWORDS.items() if k in haystack), default=(0, None))
+        if keyword:
+            covered.add(keyword)
+        elif id(link) in footer_links:
+            score = 1
+        else:
+            continue
+        if id(link) in footer_links:
+            score += 5
+        if score > scores.get(next_url, (0,))[0]:
+            scores[next_url] = (score, score >= CONTACT_CONFIDENT_SCORE)
+
+    root = urlunparse(urlparse(url)._replace(path='', params='', query='', fragment=''))
+    for path, keyword, score in CONTACT_COMMON_PATHS:
+        guess = root + path
+        if keyword not in covered and guess not in scores:
+            scores[guess] = (score, False)
+
+    ranked = sorted(scores.items(), key=lambda item: -item[1][0])
+    return [(score, next_url, fallback) for next_url, (score, fallback) in ranked]
+
+
+def is_confident_email(email, domain, page_score=0):
+    """An email on the site's own domain, or any email from a clear contact page."""
+    email_domain = email.rpartition('@')[2].lower()
+    return (email_domain == domain or email_domain.endswith('.' + domain)
+            or page_score >= CONTACT_CONFIDENT_SCORE)
+
+
+async def discover_contact_emails(session, domain, url, page_cache=None, scheduler=None):
+    """
+    Find a website's emails by fetching its most likely contact pages first.
+
+    The homepage is fetched first; ranked candidates (rank_contact_links) are
+    then fetched CONTACT_WAVE_SIZE at a time until a confident email turns up
+    or the site's page budget is spent. Returns None when the homepage can't
+    be fetched (network error, open circuit, spent ScraperAPI budget).
+    """
+    domain = clean_url(url) or domain   # Registered domain: covers www. and other subdomains
+    site = scheduler.site() if scheduler else SiteBudget(SITE_PAGE_BUDGET)
+    site.claim(url)
+
+    status, text = await fetch_text(session, url, headers=random_headers(url), page_cache=page_cache,
+                                    scheduler=scheduler)
+    if status != 200:
+        print(f"Error fetching {url}")
+        return None
+
+    emails = extract_emails(text)
+    if any(is_confident_email(email, domain) for email in emails):
+        return list(emails)
+
+    candidates = rank_contact_links(text, url, domain)
+    while candidates:
+        wave = []
+        while candidates and len(wave) < CONTACT_WAVE_SIZE:
+            score, next_url, fallback = candidates.pop(0)
+            if site.claim(next_url):
+                wave.append((score, next_url, fallback))
+        if not wave:
+            break
+
+        results = await asyncio.gather(*(
+            fetch_text(session, next_url, headers=random_headers(next_url), fallback=fallback,
+                       page_cache=page_cache, scheduler=scheduler)
+            for _, next_url, fallback in wave
+        ))
+        confident = False
+        for (score, _, _), (status, page) in zip(wave, results):
+            if status == 200:
+                found = extract_emails(page)
+                emails.update(found)
+                confident = confident or any(is_confident_email(e, domain, score) for e in found)
+        if confident:
+            break
+
+    return list(emails)
+
+
+async def process_website(session, website, page_cache=None, scheduler=None):
+    """Emails of a website, newline-separated ('' if none were found, None if the crawl failed)."""
+    if isinstance(website, str) and 'google' not in website and 'facebook' not in website:
+        start_url = website.strip()
+        domain = extract_domain(start_url)
+
+        if not start_url.startswith(("http://", "https://")):
+            start_url = "https://" + domain
+
+        try:
+            crawl = discover_contact_emails if CONTACT_DISCOVERY == 'ranked' else crawl_footer_links
+            emails = await crawl(session, domain, start_url, page_cache, scheduler)
+            return None if emails is None else '\n'.join(emails)
+        except Exception as e:
+            print(f"Error processing {start_url}: {e}")
+            return None
+    return None
+
+
+async def enrich_websites(session, websites, concurrency=ENRICH_CONCURRENCY, page_cache=None,
+                          scheduler=None):
+    """Crawl many websites in parallel; returns emails in the same order."""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def enrich(website):
+        if not website:
+            return ''
+        async with limit:
+            return await process_website(session, website, page_cache, scheduler) or ''
+
+    return await asyncio.gather(*(enrich(w) for w in websites))
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# HELPER FUNCTIONS - GOOGLE MAPS PARSING
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+def place_id(href):
+    """Stable identifier for a result card: the Maps feature id, else the place path."""
+    if not href:
+        return None
+    match = PLACE_ID_REGEX.search(href)
+    return match.group(1) if match else href.split('?')[0]
+
+
+def business_fingerprint(title, address, phone):
+    """Normalized (title, phone or address) key that identifies one business."""
+    name = NON_ALNUM_REGEX.sub(' ', (title or '').lower()).strip()
+    digits = re.sub(r'\D', '', phone or '')
+    where = digits[-10:] if digits else NON_ALNUM_REGEX.sub(' ', (address or '').lower()).strip()
+    if not name:
+        return None
+    return f"{name}|{where}"
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# CROSS-RUN DEDUPLICATION
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+class DedupIndex:
+    """
+    Persistent index of businesses, result cards and domains already scraped.
+
+    Keys are 16-byte BLAKE2 digests of "kind:value" in a WITHOUT ROWID SQLite
+    table, so rows stay small and lookups are a single primary-key probe even
+    with millions of leads. Keys touched in this process are also memoized
+    in a dict. Entries older than refresh_after count as unknown, so stale
+    entities get scraped again. For domains the payload holds the emails found.
+    """
+
+    MEMO_LIMIT = 1_000_000
+
+    def __init__(self, path=None, refresh_after=DEDUP_REFRESH_AFTER):
+        path = path or os.path.join(CACHE_DIR, "dedup.sqlite3")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.refresh_after = refresh_after
+        self.memo = {}
+        self.pending = 0
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            "key BLOB PRIMARY KEY, payload TEXT, seen_at REAL) WITHOUT ROWID"
+        )
+
+    @staticmethod
+    def _key(kind, value):
+        return hashlib.blake2b(f"{kind}:{value}".encode("utf-8"), digest_size=16).digest()
+
+    def lookup(self, kind, value):
+        """Return the payload ('' if none) for a fresh entry, or None if unknown/stale."""
+        if not value:
+            return None
+        key = self._key(kind, value)
+        entry = self.memo.get(key)
+        if entry is None:
+            entry = self.conn.execute(
+                "SELECT payload, seen_at FROM seen WHERE key = ?", (key,)
+            ).fetchone()
+            if entry is None:
+                return None
+            self._remember(key, entry)
+        payload, seen_at = entry
+        if time.time() - seen_at > self.refresh_after:
+            return None
+        return payload or ''
+
+    def add(self, kind, value, payload=''):
+        if not value:
+            return
+        key = self._key(kind, value)
+        entry = (payload, time.time())
+        self.conn.execute("INSERT OR REPLACE INTO seen VALUES (?, ?, ?)", (key, *entry))
+        self._remember(key, entry)
+        self.pending += 1
+        if self.pending >= 100:
+            self.conn.commit()
+            self.pending = 0
+
+    def _remember(self, key, entry):
+        if len(self.memo) >= self.MEMO_LIMIT:
+            self.memo.clear()
+        self.memo[key] = entry
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# CHECKPOINT / RESUME
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+def city_key(state, city, country):
+    """Key for one row of the States and Cities sheet."""
+    return f"{country}|{state}|{city}"
+
+
+class Checkpoint:
+    """
+    Durable per-listing progress for the States and Cities work queue (SQLite).
+
+    Every processed listing is recorded as (city, keyword, listing index) together
+    with its place id and, once enriched, the finished record. A keyword is
+    complete once its scanned card count is covered. After a crash run() reloads
+    the finished records and skips completed keywords and listings, so no
+    listing is clicked or crawled twice. finish_city() drops a city's rows
+    once its results were written.
+    """
+
+    def __init__(self, path=None):
+        path = path or os.path.join(CACHE_DIR, "checkpoint.sqlite3")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS listings ("
+            "  city TEXT, keyword TEXT, listing_index INTEGER, place TEXT,"
+            "  record TEXT, updated_at REAL,"
+            "  PRIMARY KEY (city, keyword, listing_index));"
+            "CREATE TABLE IF NOT EXISTS keywords ("
+            "  city TEXT, keyword TEXT, cards INTEGER,"
+            "  PRIMARY KEY (city, keyword));"
+        )
+
+    def keyword_complete(self, city, keyword):
+        row = self.conn.execute(
+            "SELECT cards FROM keywords WHERE city = ? AND keyword = ?", (city, keyword)
+        ).fetchone()
+        if not row:
+            return False
+        done = self.conn.execute(
+            "SELECT COUNT(*) FROM listings WHERE city = ? AND keyword = ?", (city, keyword)
+        ).fetchone()[0]
+        return done >= row[0]
+
+    def keyword_scanned(self, city, keyword, cards):
+        """Record how many cards the keyword's feed had once all were visited."""
+        self.conn.execute("INSERT OR REPLACE INTO keywords VALUES (?, ?, ?)", (city, keyword, cards))
+        self.conn.commit()
+
+    def listing_done(self, city, keyword, index, place=None):
+        """True if this listing was finished before (and is still the same card)."""
+        row = self.conn.execute(
+            "SELECT place FROM listings WHERE city = ? AND keyword = ? AND listing_index = ?",
+            (city, keyword, index),
+        ).fetchone()
+        return bool(row) and (not row[0] or not place or row[0] == place)
+
+    def mark_skipped(self, city, keyword, index, place=None):
+        """Record a listing that produced no record (duplicate, empty panel)."""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, NULL, ?)",
+            (city, keyword, index, place, time.time()),
+        )
+        self.conn.commit()
+
+    def save_record(self, city, record):
+        """Store a finished (enriched) record."""
+        payload = dict(record.to_dict(), place_id=record.place_id)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?)",
+            (city, record.keyword, record.listing_index, record.place_id,
+             json.dumps(payload), time.time()),
+        )
+        self.conn.commit()
+
+    def load_records(self, city):
+        """Finished records of an interrupted run, in listing order."""
+        rows = self.conn.execute(
+            "SELECT listing_index, record FROM listings WHERE city = ? AND record IS NOT NULL "
+            "ORDER BY keyword, listing_index", (city,)
+        ).fetchall()
+        return [BusinessLeadRecord(listing_index=index, **json.loads(record)) for index, record in rows]
+
+    def finish_city(self, city):
+        self.conn.execute("DELETE FROM listings WHERE city = ?", (city,))
+        self.conn.execute("DELETE FROM keywords WHERE city = ?", (city,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# GOOGLE SHEETS INTEGRATION (Optional - Replace with your own storage)
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+def setup_google_sheets():
+    """Authenticate with Google Sheets. For Colab use."""
+    try:
+        from google.colab import auth
+        auth.authenticate_user()
+        
+        import gspread
+        from google.auth import default
+        
+        creds, _ = default()
+        client = gspread.authorize(creds)
+        return client
+    except ImportError:
+        print("Not running in Colab - Google Sheets disabled")
+        return None
+
+
+_WORKSHEETS = {}
+
+
+def get_worksheet(client, sheet_name):
+    """Open a worksheet once per client and reuse the handle."""
+    key = (id(client), sheet_name)
+    if key not in _WORKSHEETS:
+        _WORKSHEETS[key] = client.open_by_key(GOOGLE_SHEET_ID).worksheet(sheet_name)
+    return _WORKSHEETS[key]
+
+
+def google_sheets_get_record(client, sheet_name='States and Cities'):
+    """Read records from a Google Sheet."""
+    if not client:
+        return pd.DataFrame()
+    worksheet = get_worksheet(client, sheet_name)
+    return pd.DataFrame(worksheet.get_all_records())
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# RESULT SINKS (Google Sheets, CSV, Parquet, SQLite)
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+def check_header(header, path):
+    """
+    Headers missing from an existing results table, which must be a prefix of
+    RECORD_COLUMNS (columns are only ever added at the end); raises otherwise.
+    """
+    expected = list(RECORD_COLUMNS)
+    if header != expected[:len(header)]:
+        raise ValueError(f"{path} has columns {header}, expected (a prefix of) {expected}")
+    return expected[len(header):]
+
+
+class LeadSink:
+    """
+    Backend that stores result rows (RECORD_COLUMNS order) and city statuses.
+
+    Backend calls are blocking; use them through SinkWriter, which serializes
+    and batches them off the event loop.
+    """
+
+    def write_rows(self, rows):
+        raise NotImplementedError
+
+    def set_statuses(self, statuses):
+        """statuses: list of (States and Cities sheet row, value)."""
+
+    def close(self):
+        pass
+
+
+class SheetsSink(LeadSink):
+    """Google Sheets backend: cached worksheet handles, append_rows, quota throttling."""
+
+    def __init__(self, client, writes_per_minute=SHEETS_WRITES_PER_MINUTE,
+                 max_retries=SHEETS_MAX_RETRIES):
+        self.results = get_worksheet(client, 'scrapedResults')
+        self.cities = get_worksheet(client, 'States and Cities')
+        self.min_interval = 60.0 / writes_per_minute
+        self.max_retries = max_retries
+        self.last_call = 0.0
+
+        # Columns added since the sheet was set up get their header cell first
+        header = self._call(self.results.row_values, 1)
+        if not header:
+            self._call(self.results.batch_update, [{'range': 'A1', 'values': [list(RECORD_COLUMNS)]}])
+            return
+        try:
+            missing = check_header(header, 'scrapedResults')
+        except ValueError as e:
+            # Sheets filled by older versions start with a data row, not a header
+            print(f"Warning: {e}. Row 1 is left as is; insert the header row by hand "
+                  f"to label the columns.")
+            return
+        for column, name in enumerate(missing, len(header) + 1):
+            self._call(self.results.update_cell, 1, column, name)
+
+    def _call(self, method, *args, **kwargs):
+        """Run one Sheets API call, spaced out per quota and retried on 429 / 5xx."""
+        import gspread
+        for attempt in range(self.max_retries + 1):
+            wait = self.min_interval - (time.monotonic() - self.last_call)
+            if wait > 0:
+                time.sleep(wait)
+            self.last_call = time.monotonic()
+            try:
+                return method(*args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                status = getattr(getattr(e, 'response', None), 'status_code', None)
+                if status not in (429, 500, 502, 503) or attempt == self.max_retries:
+                    raise
+                time.sleep(min(2 ** attempt + random.random(), 64))
+
+    def write_rows(self, rows):
+        self._call(self.results.append_rows, rows, value_input_option='RAW')
+
+    def set_statuses(self, statuses):
+        self._call(self.cities.batch_update, [
+            {'range': f'D{row}', 'values': [[value]]} for row, value in statuses
+        ])
+
+
+class CsvSink(LeadSink):
+    """Local CSV backend; statuses go to a sidecar <path>.status.csv."""
+
+    def __init__(self, path=SINK_PATH + ".csv"):
+        self.path = path
+        self.status_path = os.path.splitext(path)[0] + ".status.csv"
+        if not os.path.exists(path):
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerow(RECORD_COLUMNS.keys())
+            return
+
+        # A file from an older version lacks the newest columns: rewrite it with
+        # the full header and empty cells, so new rows line up
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        header = rows[0] if rows else []
+        missing = check_header(header, path)
+        if missing:
+            with open(path + '.tmp', 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(RECORD_COLUMNS.keys())
+                writer.writerows(row + [''] * (len(RECORD_COLUMNS) - len(row)) for row in rows[1:])
+            os.replace(path + '.tmp', path)
+
+    def write_rows(self, rows):
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+
+    def set_statuses(self, statuses):
+        with open(self.status_path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(statuses)
+
+
+class ParquetSink(LeadSink):
+    """
+    Local Parquet backend (pyarrow); each batch becomes one row group.
+
+    A Parquet file can't be appended to once closed, so every run writes its
+    own <path stem>-<start time>-<pid>.parquet next to `path` (read them back
+    together as a dataset). Statuses go to the <path stem>.status.csv sidecar.
+    """
+
+    def __init__(self, path=SINK_PATH + ".parquet"):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("ParquetSink needs pyarrow: pip install pyarrow")
+        stem, extension = os.path.splitext(path)
+        self.path = f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}{extension or '.parquet'}"
+        self.status_path = stem + ".status.csv"
+        self.pa = pa
+        self.schema = pa.schema([(header, pa.string()) for header in RECORD_COLUMNS])
+        self.writer = pq.ParquetWriter(self.path, self.schema)
+
+    def write_rows(self, rows):
+        columns = list(zip(*rows)) if rows else [()] * len(RECORD_COLUMNS)
+        self.writer.write_table(self.pa.table(
+            [self.pa.array([str(v) for v in column], self.pa.string()) for column in columns],
+            schema=self.schema,
+        ))
+
+    def set_statuses(self, statuses):
+        with open(self.status_path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(statuses)
+
+    def close(self):
+        self.writer.close()
+
+
+class SqliteSink(LeadSink):
+    """Local SQLite backend with a results and a status table."""
+
+    def __init__(self, path=SINK_PATH + ".sqlite3"):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        columns = ', '.join(f'"{header}" TEXT' for header in RECORD_COLUMNS)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS results ({columns})")
+        existing = [row[1] for row in self.conn.execute("PRAGMA table_info(results)")]
+        for header in check_header(existing, path):
+            self.conn.execute(f'ALTER TABLE results ADD COLUMN "{header}" TEXT')
+        self.conn.execute("CREATE TABLE IF NOT EXISTS status (row INTEGER PRIMARY KEY, value TEXT)")
+        self.insert = f"INSERT INTO results VALUES ({', '.join('?' * len(RECORD_COLUMNS))})"
+
+    def write_rows(self, rows):
+        with self.conn:
+            self.conn.executemany(self.insert, rows)
+
+    def set_statuses(self, statuses):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO status VALUES (?, ?)", statuses)
+
+    def close(self):
+        self.conn.close()
+
+
+def make_sink(backend=SINK_BACKEND, client=None, path=None):
+    """Build a LeadSink by name; 'sheets' needs a gspread client."""
+    if backend == 'sheets':
+        if not client:
+            raise ValueError("The 'sheets' sink needs a Google Sheets client")
+        return SheetsSink(client)
+    backends = {'csv': (CsvSink, '.csv'), 'parquet': (ParquetSink, '.parquet'),
+                'sqlite': (SqliteSink, '.sqlite3')}
+    if backend not in backends:
+        raise ValueError(f"Unknown sink backend: {backend}")
+    sink_class, extension = backends[backend]
+    return sink_class(path or SINK_PATH + extension)
+
+
+class SinkWriter:
+    """
+    The single serialized writer in front of a LeadSink.
+
+    Callers await write_rows() / set_status() until their data is stored. All
+    requests queued while a write is in flight are coalesced into the next
+    one (rows first, then statuses, so a city is never marked Done before its
+    rows land). Backend calls run in a thread, off the event loop.
+    """
+
+    def __init__(self, sink, batch_rows=SINK_BATCH_ROWS):
+        self.sink = sink
+        self.batch_rows = batch_rows
+        self.queue = asyncio.Queue()
+        self.task = None
+        self.rows_written = 0
+        self.writes = 0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+        return self
+
+    async def _submit(self, kind, payload):
+        self.start()
+        done = asyncio.get_running_loop().create_future()
+        await self.queue.put((kind, payload, done))
+        await done
+
+    async def write_rows(self, rows):
+        if rows:
+            await self._submit('rows', rows)
+
+    async def set_status(self, row, value):
+        await self._submit('status', (row, value))
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            stop = any(item is None for item in batch)
+            batch = [item for item in batch if item is not None]
+            rows = [row for kind, payload, _ in batch if kind == 'rows' for row in payload]
+            statuses = [payload for kind, payload, _ in batch if kind == 'status']
+
+            try:
+                for start in range(0, len(rows), self.batch_rows):
+                    with telemetry.span('sink.write_rows'):
+                        await asyncio.to_thread(self.sink.write_rows, rows[start:start + self.batch_rows])
+                    self.writes += 1
+                self.rows_written += len(rows)
+                if statuses:
+                    with telemetry.span('sink.set_statuses'):
+                        await asyncio.to_thread(self.sink.set_statuses, statuses)
+                    self.writes += 1
+            except Exception as e:
+                for _, _, done in batch:
+                    if not done.done():
+                        done.set_exception(e)
+            else:
+                for _, _, done in batch:
+                    if not done.done():
+                        done.set_result(None)
+
+            if stop:
+                break
+
+    async def close(self):
+        if self.task:
+            await self.queue.put(None)
+            await self.task
+        await asyncio.to_thread(self.sink.close)
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# BROWSER POOL
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+def _browser_process_ids():
+    """PIDs of Chromium processes started by this Python process (empty without psutil)."""
+    try:
+        import psutil
+        return {
+            p.pid for p in psutil.Process().children(recursive=True)
+            if 'chrom' in p.name().lower()
+        }
+    except Exception:
+        return set()
+
+
+def _process_tree_rss_mb(pid):
+    """Resident memory of a process and its children in MB, or None if unknown."""
+    try:
+        import psutil
+        root = psutil.Process(pid)
+        procs = [root] + root.children(recursive=True)
+        return sum(p.memory_info().rss for p in procs) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class PooledBrowser:
+    """A launched browser plus its bookkeeping inside BrowserPool."""
+
+    __slots__ = ('browser', 'pid', 'uses', 'active', 'retiring')
+
+    def __init__(self, browser, pid):
+        self.browser = browser
+        self.pid = pid
+        self.uses = 0
+        self.active = 0
+        self.retiring = False
+
+
+class BrowserPool:
+    """
+    Long-lived Chromium browsers that hand out fresh contexts.
+
+    One launched browser serves many contexts at once. A browser is retired
+    (closed once its last context is released) after max_uses contexts, when
+    its process tree grows past max_rss_mb, or when it disconnects.
+    """
+
+    def __init__(self, playwright, size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES,
+                 max_rss_mb=BROWSER_MAX_RSS_MB, **launch_options):
+        self.playwright = playwright
+        self.size = size
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.launch_options = launch_options or {'headless': True}
+        self.browsers = []
+        self.leases = {}
+        self.lock = asyncio.Lock()
+        self.launches = 0
+        self.launch_seconds = 0.0
+        self.contexts = 0
+        self.recycled = 0
+        self.saved_seconds = 0.0
+
+    def average_launch_seconds(self):
+        return self.launch_seconds / self.launches if self.launches else 0.0
+
+    async def _launch(self):
+        before = _browser_process_ids()
+        started = time.perf_counter()
+        browser = await self.playwright.chromium.launch(**self.launch_options)
+        self.launch_seconds += time.perf_counter() - started
+        self.launches += 1
+
+        # The new browser's root process is the new PID whose parent is not new
+        new = _browser_process_ids() - before
+        pid = None
+        try:
+            import psutil
+            roots = [p for p in new if psutil.Process(p).ppid() not in new]
+            pid = roots[0] if roots else None
+        except Exception:
+            pass
+        return PooledBrowser(browser, pid)
+
+    async def acquire(self, **context_options):
+        """Lease a new browser context; returns (context, startup_seconds_saved)."""
+        async with self.lock:
+            self.browsers = [b for b in self.browsers if b.browser.is_connected()]
+            for pooled in self.browsers:
+                if pooled.uses >= self.max_uses:
+                    pooled.retiring = True
+            live = [b for b in self.browsers if not b.retiring]
+
+            if len(live) < self.size:
+                pooled = await self._launch()
+                self.browsers.append(pooled)
+                saved = 0.0
+            else:
+                pooled = min(live, key=lambda b: b.active)
+                saved = self.average_launch_seconds()
+
+            pooled.uses += 1
+            pooled.active += 1
+
+        try:
+            context = await pooled.browser.new_context(**context_options)
+        except Exception:
+            pooled.active -= 1
+            pooled.retiring = True
+            raise
+
+        self.leases[context] = pooled
+        self.contexts += 1
+        self.saved_seconds += saved
+        return context, saved
+
+    async def release(self, context):
+        """Close a leased context and recycle its browser if it is worn out."""
+        pooled = self.leases.pop(context, None)
+        try:
+            await context.close()
+        except Exception:
+            pass
+        if pooled is None:
+            return
+
+        pooled.active -= 1
+        if pooled.uses >= self.max_uses or not pooled.browser.is_connected():
+            pooled.retiring = True
+        elif self.max_rss_mb and pooled.pid:
+            rss = _process_tree_rss_mb(pooled.pid)
+            if rss and rss > self.max_rss_mb:
+                pooled.retiring = True
+
+        if pooled.retiring and pooled.active == 0:
+            await self._retire(pooled)
+
+    async def _retire(self, pooled):
+        if pooled in self.browsers:
+            self.browsers.remove(pooled)
+        self.recycled += 1
+        await self._close_browser(pooled)
+
+    @staticmethod
+    async def _close_browser(pooled):
+        try:
+            await pooled.browser.close()
+        except Exception:
+            pass
+
+    async def close(self):
+        browsers, self.browsers = self.browsers, []
+        for pooled in browsers:
+            await self._close_browser(pooled)
+
+    def report(self):
+        return {
+            'launches': self.launches,
+            'contexts': self.contexts,
+            'recycled': self.recycled,
+            'avg_launch_s': round(self.average_launch_seconds(), 2),
+            'startup_saved_s': round(self.saved_seconds, 1),
+        }
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# REQUEST BLOCKING
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+class ResourceBlocker:
+    """
+    Aborts Maps page requests the extractor never reads (tiles, photos, fonts, trackers).
+
+    Requests are blocked by resource type or URL pattern; allow patterns win
+    over both. Counts blocked requests per resource type and the bytes that
+    the allowed responses still transferred (aborted requests report no size).
+    """
+
+    def __init__(self, resource_types=BLOCKED_RESOURCE_TYPES, block_patterns=BLOCKED_URL_PATTERNS,
+                 allow_patterns=ALLOWED_URL_PATTERNS):
+        self.resource_types = frozenset(resource_types)
+        self.block = re.compile('|'.join(block_patterns)) if block_patterns else None
+        self.allow = re.compile('|'.join(allow_patterns)) if allow_patterns else None
+        self.blocked = {}
+        self.allowed = 0
+        self.bytes_loaded = 0
+
+    def should_block(self, url, resource_type):
+        if self.allow and self.allow.search(url):
+            return False
+        return resource_type in self.resource_types or bool(self.block and self.block.search(url))
+
+    async def install(self, context):
+        """Route every request of a browser context through the blocker."""
+        await context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+
+    async def _handle(self, route):
+        request = route.request
+        if self.should_block(request.url, request.resource_type):
+            self.blocked[request.resource_type] = self.blocked.get(request.resource_type, 0) + 1
+            await route.abort()
+        else:
+            self.allowed += 1
+            await route.continue_()
+
+    def _on_response(self, response):
+        try:
+            self.bytes_loaded += int(response.headers.get('content-length', 0))
+        except ValueError:
+            pass
+
+    def report(self):
+        return {
+            'blocked': sum(self.blocked.values()),
+            'blocked_by_type': dict(self.blocked),
+            'allowed': self.allowed,
+            'kb_loaded': self.bytes_loaded // 1024,
+        }
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# LEAD RECORDS
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+class BusinessLeadRecord:
+    """One scraped business (see OUTPUT in the module docstring); __slots__ keeps it small."""
+
+    __slots__ = tuple(RECORD_COLUMNS.values()) + ('place_id', 'listing_index', 'crawled')
+
+    def __init__(self, place_id=None, listing_index=None, **fields):
+        self.place_id = place_id
+        self.listing_index = listing_index
+        self.crawled = None     # Host of a website crawled successfully in this run (dedup key)
+        for attr in RECORD_COLUMNS.values():
+            value = fields.pop(attr, '')
+            setattr(self, attr, '' if value is None else value)
+        if fields:
+            raise TypeError(f"Unknown BusinessLeadRecord fields: {', '.join(fields)}")
+
+    def to_row(self):
+        """Values in RECORD_COLUMNS order (one Google Sheets row)."""
+        return [getattr(self, attr) for attr in RECORD_COLUMNS.values()]
+
+    def to_dict(self):
+        return {attr: getattr(self, attr) for attr in RECORD_COLUMNS.values()}
+
+
+class RecordBuffer:
+    """
+    Columnar buffer of BusinessLeadRecords.
+
+    Records are appended as one list per column (no per-row objects are kept)
+    and only turned into rows, a DataFrame or an Arrow table in one step when
+    the buffer is flushed.
+    """
+
+    def __init__(self):
+        self.columns = {attr: [] for attr in RECORD_COLUMNS.values()}
+
+    def __len__(self):
+        return len(self.columns['business_name'])
+
+    def append(self, record):
+        for attr, column in self.columns.items():
+            column.append(getattr(record, attr))
+
+    def column(self, attr):
+        return self.columns[attr]
+
+    def set_column(self, attr, values):
+        values = list(values)
+        if len(values) != len(self):
+            raise ValueError(f"Column {attr} has {len(values)} values, buffer has {len(self)} rows")
+        self.columns[attr] = values
+
+    def to_rows(self):
+        """List of rows in RECORD_COLUMNS order (Google Sheets / CSV)."""
+        return [list(row) for row in zip(*self.columns.values())]
+
+    def to_dataframe(self):
+        """pandas DataFrame with the Google Sheets column headers."""
+        return pd.DataFrame({header: self.columns[attr] for header, attr in RECORD_COLUMNS.items()})
+
+    def to_arrow(self):
+        """pyarrow Table with BusinessLeadRecord attribute names as columns."""
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("RecordBuffer.to_arrow() needs pyarrow: pip install pyarrow")
+        return pa.table({attr: pa.array([str(v) for v in values], type=pa.string())
+                         for attr, values in self.columns.items()})
+
+    def clear(self):
+        for column in self.columns.values():
+            column.clear()
+
+
+class StreamExporter:
+    """
+    Appends finished records to rotating NDJSON or Parquet files as they arrive.
+
+    Files roll over by size or age. NDJSON is written straight to
+    leads-<time>-<n>.ndjson, so it can be tailed live; Parquet is only
+    readable once closed, so it is written to a .part file and renamed on
+    rollover. Data is flushed and fsynced at most every fsync_seconds.
+    """
+
+    def __init__(self, fmt=STREAM_EXPORT or 'ndjson', directory=STREAM_DIR,
+                 rotate_bytes=STREAM_ROTATE_BYTES, rotate_seconds=STREAM_ROTATE_SECONDS,
+                 fsync_seconds=STREAM_FSYNC_SECONDS):
+        if fmt not in ('ndjson', 'parquet'):
+            raise ValueError(f"Unknown stream format: {fmt}")
+        if fmt == 'parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Parquet streaming needs pyarrow: pip install pyarrow")
+            self.pa, self.pq = pa, pq
+            self.schema = pa.schema([(field, pa.string()) for field in STREAM_FIELDS])
+        os.makedirs(directory, exist_ok=True)
+        self.fmt = fmt
+        self.directory = directory
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.fsync_seconds = fsync_seconds
+        self.file = None
+        self.writer = None
+        self.pending = []
+        self.sequence = 0
+        self.records = 0
+        self.files = []
+
+    def _open(self):
+        self.sequence += 1
+        name = f"leads-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.sequence:04d}.{self.fmt}"
+        self.path = os.path.join(self.directory, name)
+        if self.fmt == 'ndjson':
+            self.file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self.file = open(self.path + '.part', 'wb')
+            self.writer = self.pq.ParquetWriter(self.file, self.schema)
+        self.opened = self.synced = time.monotonic()
+        self.size = 0
+
+    def write(self, record):
+        if self.file is None:
+            self._open()
+        values = {field: str(getattr(record, field)) for field in STREAM_FIELDS}
+        if self.fmt == 'ndjson':
+            line = json.dumps(values, ensure_ascii=False) + '\n'
+            self.file.write(line)
+            self.size += len(line)
+        else:
+            self.pending.append(values)
+        self.records += 1
+
+        now = time.monotonic()
+        if now - self.synced >= self.fsync_seconds:
+            self.sync()
+        if self.size >= self.rotate_bytes or now - self.opened >= self.rotate_seconds:
+            self.rotate()
+
+    def sync(self):
+        """Push buffered records to disk (one Parquet row group per sync)."""
+        if self.file is None:
+            return
+        if self.pending:
+            self.writer.write_table(self.pa.Table.from_pylist(self.pending, schema=self.schema))
+            self.pending = []
+            self.size = self.file.tell()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.synced = time.monotonic()
+
+    def rotate(self):
+        """Close the current file; the next record opens a new one."""
+        if self.file is None:
+            return
+        self.sync()
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        self.file.close()
+        self.file = None
+        if self.fmt == 'parquet':
+            os.replace(self.path + '.part', self.path)
+        self.files.append(self.path)
+
+    def close(self):
+        self.rotate()
+
+    def report(self):
+        return f"{self.records} records streamed to {len(self.files)} {self.fmt} file(s) in {self.directory}"
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# POST-PROCESSING (batch normalization)
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+def _string_dtype():
+    """Arrow-backed strings when pyarrow is installed (string ops run in C++)."""
+    try:
+        import pyarrow  # noqa: F401
+        return pd.StringDtype('pyarrow')
+    except ImportError:
+        return pd.StringDtype('python')
+
+
+def _strings(values):
+    """A buffer column as a pandas string Series (numbers become text)."""
+    return pd.Series(values, dtype=_string_dtype())
+
+
+def _extract(series, pattern):
+    """
+    Named regex groups as string columns (<NA> where a row doesn't match).
+
+    Runs pyarrow's RE2 kernel on the Arrow buffer when pyarrow is installed,
+    which is several times faster than pandas' Series.str.extract.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        return series.str.extract(pattern).astype(_string_dtype())
+    groups = pc.extract_regex(pa.array(series.array), pattern)
+    dtype = _string_dtype()
+    return pd.DataFrame({field.name: pd.Series(groups.field(field.name).to_pandas(), dtype=dtype)
+                         for field in groups.type}, index=series.index)
+
+
+def _numbers(series, integer=False):
+    """Numeric column as Python values, '' where missing (Sheets/CSV friendly)."""
+    if integer:
+        series = series.round().astype('Int64')
+    return series.astype(object).where(series.notna(), '').tolist()
+
+
+def normalize_emails(emails):
+    """
+    Newline-separated email lists with invalid and repeated entries dropped.
+
+    Records of one website share the same list, so each distinct list is
+    cleaned once, and each distinct email checked with is_valid_email once;
+    the results are mapped back onto the column.
+    """
+    codes, lists = pd.factorize(pd.Series(emails, dtype=object).fillna(''))
+    valid = {}
+    cleaned = []
+    for value in lists:
+        kept = []
+        for email in value.split('\n'):
+            email = email.strip()
+            ok = valid.get(email)
+            if ok is None:
+                ok = valid[email] = is_valid_email(email)
+            if ok and email not in kept:
+                kept.append(email)
+        cleaned.append('\n'.join(kept))
+    return pd.Series(cleaned, dtype=object).take(codes).tolist() if len(codes) else []
+
+
+def normalize_buffer(buffer):
+    """
+    Normalize a RecordBuffer in place, one column at a time.
+
+    - business_address: "Address:" prefix dropped; city, state and ZIP parsed
+      from the "City, ST 12345" tail (rows that don't match keep the searched
+      city/state)
+    - business_state: abbreviations and any-case names mapped to the full name
+    - rating / review_count: numbers ("(1,234)" -> 1234), '' when missing
+    - domain: registered domain of business_website (tldextract, once per host)
+    - business_email: invalid or duplicate emails dropped
+    """
+    if not len(buffer):
+        return buffer
+    with telemetry.span('postprocess.normalize'):
+        address = (_strings(buffer.column('business_address'))
+                   .str.replace(r'^\s*Address:', '', regex=True).str.strip())
+        parts = _extract(address, ADDRESS_REGEX)
+        parsed_state = parts['state'].str.lower().map(STATE_NAMES)
+        matched = parsed_state.notna()
+        searched_state = _strings(buffer.column('business_state')).str.strip()
+        state = parsed_state.where(matched, searched_state.str.lower().map(STATE_NAMES)
+                                   .fillna(searched_state))
+        city = parts['city'].where(matched, _strings(buffer.column('business_city')))
+
+        rating = pd.to_numeric(_strings(buffer.column('rating'))
+                               .str.replace(',', '.', regex=False), errors='coerce')
+        reviews = pd.to_numeric(_strings(buffer.column('review_count'))
+                                .str.replace(r'[^\d]', '', regex=True), errors='coerce')
+
+        hosts = _extract(_strings(buffer.column('business_website')), HOST_REGEX)['host'].str.lower()
+        domains = hosts.map({host: registered_domain(host) for host in hosts.dropna().unique()})
+
+        buffer.set_column('business_address', address.tolist())
+        buffer.set_column('business_city', city.tolist())
+        buffer.set_column('business_state', state.astype(object).tolist())
+        buffer.set_column('business_zip', parts['zip'].where(matched, '').fillna('').tolist())
+        buffer.set_column('rating', _numbers(rating.astype(float).round(1)))
+        buffer.set_column('review_count', _numbers(reviews.astype(float), integer=True))
+        buffer.set_column('domain', domains.where(domains.notna(), '').tolist())
+        buffer.set_column('business_email', normalize_emails(buffer.column('business_email')))
+    return buffer
+
+
+def normalize_records(records):
+    """normalize_buffer() for a small batch of BusinessLeadRecords (updated in place)."""
+    if not records:
+        return records
+    batch = RecordBuffer()
+    for record in records:
+        batch.append(record)
+    normalize_buffer(batch)
+    for attr, values in batch.columns.items():
+        for record, value in zip(records, values):
+            setattr(record, attr, value)
+    return records
+# ═══════════════════════════════════════════════════════════════════════════════════
+# PIPELINE STAGES (Maps -> enrichment workers -> writer)
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+class StageStats:
+    """Item count and busy time for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.started = time.perf_counter()
+
+    def add(self, seconds):
+        self.items += 1
+        self.busy += seconds
+
+    def report(self):
+        wall = max(time.perf_counter() - self.started, 1e-9)
+        return (f"{self.name}: {self.items} items in {wall:.1f}s "
+                f"({self.items / wall:.2f}/s, busy {self.busy:.1f}s)")
+
+
+def stage_error(tasks):
+    """First exception raised by a finished pipeline task (None if there is none)."""
+    for task in tasks:
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            return task.exception()
+    return None
+
+
+async def stop_stage(queue, tasks):
+    """
+    Send every task of a stage its None sentinel and wait for all of them.
+
+    Tasks that already finished (or were cancelled) no longer read the queue,
+    so a full queue is only waited on while some task is still running.
+    """
+    for _ in tasks:
+        while not all(task.done() for task in tasks):
+            try:
+                queue.put_nowait(None)
+                break
+            except asyncio.QueueFull:
+                await asyncio.sleep(0.05)
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def enrichment_worker(in_queue, out_queue, http_session, stats, page_cache=None,
+                            dedup_index=None, scheduler=None):
+    """Pull partial records, crawl their website for emails, pass them on."""
+    while True:
+        record = await in_queue.get()
+        if record is None:
+            break
+
+        started = time.perf_counter()
+        website = record.business_website
+        host = site_host(website) if website else None
+        known = dedup_index.lookup('domain', host) if dedup_index and host else None
+
+        try:
+            if known is not None:
+                # Site crawled recently - reuse its emails
+                record.business_email = known
+            elif website:
+                emails = await process_website(http_session, website, page_cache, scheduler)
+                record.business_email = emails or ''
+                # Failed crawls are retried next time; the writer records the host
+                record.crawled = host if emails is not None else None
+        except Exception as e:
+            # One bad website must not stop the worker (the queues would fill up)
+            telemetry.count('errors_total', where='enrich')
+            print(f"Error enriching {website}: {e}")
+        stats.add(time.perf_counter() - started)
+
+        # Blocks while the writer is behind (backpressure)
+        await out_queue.put(record)
+
+
+async def writer_stage(queue, buffer, stats, dedup_index=None, checkpoint=None, city=None,
+                       exporter=None):
+    """
+    Collect finished records into the RecordBuffer (and the checkpoint / stream).
+
+    Whatever is waiting in the queue (up to WRITER_BATCH_SIZE records) is
+    normalized together first, so the checkpoint, the stream and the buffer
+    all hold the same, normalized values.
+    """
+    done = False
+    while not done:
+        batch = [await queue.get()]
+        while len(batch) < WRITER_BATCH_SIZE and not queue.empty():
+            batch.append(queue.get_nowait())
+        done = None in batch
+        records = [record for record in batch if record is not None]
+
+        started = time.perf_counter()
+        normalize_records(records)
+        for record in records:
+            buffer.append(record)
+            if checkpoint:
+                checkpoint.save_record(city, record)
+            if exporter:
+                exporter.write(record)
+
+            # Only written records count as known, so a crash never hides a lead
+            if dedup_index:
+                dedup_index.add('place', record.place_id)
+                dedup_index.add('business', business_fingerprint(
+                    record.business_name, record.business_address, record.business_phone))
+                if record.crawled:
+                    dedup_index.add('domain', record.crawled, record.business_email)
+        seconds = (time.perf_counter() - started) / max(len(records), 1)
+        for _ in records:
+            stats.add(seconds)
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# ADAPTIVE WAITS
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+class WaitTimer:
+    """
+    Waits on page signals and splits each Maps stage into waiting vs working time.
+
+    wait() runs a Playwright wait (selector, load state, wait_for_function) and
+    returns False instead of raising on timeout. pause() adds the jitter of the
+    active WAIT_PROFILE, if any.
+    """
+
+    def __init__(self, profile=WAIT_PROFILE):
+        self.profile = WAIT_PROFILES.get(profile) if profile else None
+        self.total = {}
+        self.waiting = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.total[name] = self.total.get(name, 0.0) + time.perf_counter() - started
+
+    def add_wait(self, stage, seconds):
+        self.waiting[stage] = self.waiting.get(stage, 0.0) + seconds
+
+    async def wait(self, stage, awaitable):
+        started = time.perf_counter()
+        try:
+            await awaitable
+            return True
+        except Exception:
+            return False
+        finally:
+            self.add_wait(stage, time.perf_counter() - started)
+
+    async def pause(self, stage):
+        if self.profile and self.profile['pause']:
+            seconds = random.uniform(*self.profile['pause'])
+            await asyncio.sleep(seconds)
+            self.add_wait(stage, seconds)
+
+    def typing_delay(self):
+        """Per-character typing delay in ms, or None to fill the input at once."""
+        if self.profile and self.profile['typing_delay_ms']:
+            return random.randint(*self.profile['typing_delay_ms'])
+        return None
+
+    def report(self):
+        return {
+            name: {'wait_s': round(self.waiting.get(name, 0.0), 1),
+                   'work_s': round(total - self.waiting.get(name, 0.0), 1)}
+            for name, total in self.total.items()
+        }
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# MAIN SCRAPER LOGIC
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+async def open_maps(page, waits, maps_url=MAPS_URL):
+    """Load the Maps entry page, accepting the consent dialog if it shows; True if the search box is there."""
+    search_input = page.locator(SELECTORS['search_input'])
+    consent = page.get_by_role("button", name="Accept all")
+
+    # Go on as soon as the search box or consent shows
+    with waits.stage('navigate'), telemetry.span('maps.navigate'):
+        await page.goto(maps_url)
+        await waits.wait('navigate', search_input.or_(consent).first.wait_for(timeout=WAIT_TIMEOUT_MS))
+
+        # Handle consent dialog
+        if await consent.count():
+            await consent.first.click()
+            await waits.wait('navigate', search_input.wait_for(timeout=WAIT_TIMEOUT_MS))
+
+    return await search_input.count() > 0
+
+
+def maps_search_url(query, maps_url=MAPS_URL, center=None, zoom=MAPS_SEARCH_ZOOM):
+    """Maps search URL for query (".../maps/search/<query>/@lat,lng,zoomz?hl=en")."""
+    parsed = urlparse(maps_url)
+    path = f"{parsed.path.rstrip('/')}/search/{quote_plus(query)}/"
+    if center:
+        path += f"@{center[0]},{center[1]},{zoom}z"
+    return urlunparse(parsed._replace(path=path))
+
+
+async def direct_search(page, waits, query, results, maps_url=MAPS_URL, center=None):
+    """
+    Open the search URL for query directly (no typing).
+
+    Returns 'results' once the feed (or a single place) shows, 'challenged'
+    on a captcha / unusual-traffic page or a page without the Maps UI, and
+    'empty' otherwise.
+    """
+    consent = page.get_by_role("button", name="Accept all")
+    with waits.stage('search'), telemetry.span('maps.direct_search'):
+        await page.goto(maps_search_url(query, maps_url, center))
+        await waits.wait('search', results.or_(consent).first.wait_for(timeout=WAIT_TIMEOUT_MS))
+        if await consent.count():
+            await consent.first.click()
+            await waits.wait('search', results.first.wait_for(timeout=WAIT_TIMEOUT_MS))
+
+        if await results.count():
+            return 'results'
+        if ('/sorry/' in page.url or await page.locator('#captcha-form, iframe[src*="recaptcha"]').count()
+                or not await page.locator(SELECTORS['search_input']).count()):
+            return 'challenged'
+        return 'empty'
+
+
+async def scrape_keywords(page, keywords, state, city, country, queue, stats, dedup_index=None,
+                          waits=None, checkpoint=None, maps_url=MAPS_URL, center=None,
+                          search_mode=SEARCH_MODE):
+    """Maps stage: search each keyword and push partial business records to queue."""
+    waits = waits or WaitTimer()
+    key = city_key(state, city, country)
+    search_input = page.locator(SELECTORS['search_input'])
+    results = page.locator(SELECTORS['result_cards']).first.or_(
+        page.locator(f"xpath={SELECTORS['title_xpath']}"))
+
+    for keyword in keywords:
+        try:
+            print(f'{keyword} - {city} - {state}', end=' - ')
+
+            if checkpoint and checkpoint.keyword_complete(key, keyword):
+                print('Already done (checkpoint)')
+                continue
+
+            query_text = f"{keyword} near {city} {state} {country}"
+            outcome = 'typed'
+            if search_mode == 'direct':
+                # Straight to the results feed; type the query only if challenged
+                outcome = await direct_search(page, waits, query_text, results, maps_url, center)
+                page.set_default_timeout(15000)
+                if outcome == 'challenged':
+                    telemetry.count('search_fallbacks_total')
+                    if not SEARCH_TYPED_FALLBACK:
+                        continue
+                    outcome = 'typed'
+
+            if outcome == 'typed':
+                # Navigate to Google Maps
+                found = await open_maps(page, waits, maps_url)
+                page.set_default_timeout(15000)
+
+                if not found:
+                    telemetry.count('selector_misses_total', selector='search_input')
+                    continue
+                print('Browser launched', end=' - ')
+
+                with waits.stage('search'), telemetry.span('maps.search'):
+                    await waits.pause('search')
+
+                    # Type (human profile) or fill the query, then wait for the feed
+                    delay = waits.typing_delay()
+                    if delay:
+                        await search_input.type(query_text, delay=delay)
+                    else:
+                        await search_input.fill(query_text)
+                    await waits.pause('search')
+                    await search_input.press("Enter")
+
+                    if not await waits.wait('search', results.wait_for(timeout=WAIT_TIMEOUT_MS)):
+                        await waits.wait('search', page.wait_for_load_state('networkidle', timeout=WAIT_STEP_TIMEOUT_MS))
+            print('Search made', end=' - ')
+
+            # Harvest cards as the feed loads them: a MutationObserver queues each
+            # new card once (by place URL / aria-label) and every take scrolls the
+            # feed, so the next batch loads while this one is processed
+            page.set_default_timeout(3000)
+            await page.evaluate(HARVEST_INIT_JS, SELECTORS['result_cards'])
+            harvested = 0
+            stalls = 0
+            while True:
+                with waits.stage('scroll'), telemetry.span('maps.harvest'):
+                    batch = await page.evaluate(HARVEST_TAKE_JS)
+                cards = batch['cards']
+                if MAPS_RESULT_CAP:
+                    cards = cards[:max(0, MAPS_RESULT_CAP - harvested)]
+                harvested += len(cards)
+
+                # Process each new card; enrichment happens in the worker pool
+                for card in cards:
+                    i = card['index']
+                    with waits.stage('cards'):
+                        try:
+                            started = time.perf_counter()
+
+                            # Skip cards already scraped in this or an earlier run
+                            place = place_id(card['href'])
+                            if checkpoint and checkpoint.listing_done(key, keyword, i, place):
+                                continue
+                            if dedup_index and dedup_index.lookup('place', place) is not None:
+                                if checkpoint:
+                                    checkpoint.mark_skipped(key, keyword, i, place)
+                                continue
+
+                            await waits.pause('cards')
+                            with telemetry.span('maps.card.click'):
+                                await page.locator(f'[data-gmaps-idx="{i}"]').last.click()
+
+                            # All fields in one in-page call, once the panel shows this card
+                            with telemetry.span('maps.card.extract'):
+                                listing = await page.evaluate(EXTRACT_LISTING_JS, {
+                                    'selectors': SELECTORS,
+                                    'timeout': WAIT_STEP_TIMEOUT_MS,
+                                    'place': place,
+                                })
+                            waits.add_wait('cards', listing['waited'] / 1000)
+                            for field, selector in LISTING_SELECTORS.items():
+                                if not listing[field]:
+                                    telemetry.count('selector_misses_total', selector=selector)
+                            title = listing['title']
+                            # A panel still showing the previous card would give
+                            # this place another business's details
+                            if not title or not listing['ready']:
+                                if checkpoint:
+                                    checkpoint.mark_skipped(key, keyword, i, place)
+                                continue
+
+                            category = listing['category']
+                            rating = listing['rating']
+                            website = listing['website']
+                            address = listing['address'].replace('Address:', '').strip()
+
+                            phone = listing['phone'].replace('Phone:', '').strip()
+
+                            fingerprint = business_fingerprint(title, address, phone)
+                            if dedup_index and dedup_index.lookup('business', fingerprint) is not None:
+                                dedup_index.add('place', place)
+                                if checkpoint:
+                                    checkpoint.mark_skipped(key, keyword, i, place)
+                                continue
+
+                            record = BusinessLeadRecord(
+                                place_id=place,
+                                listing_index=i,
+                                keyword=keyword,
+                                business_category=category,
+                                business_name=title,
+                                business_state=state,     # Parsed from the address
+                                business_city=city,       # by the writer stage
+                                business_address=address,
+                                business_website=website,
+                                business_phone=phone,
+                                rating=rating,
+                                review_count=listing['reviews'],
+                            )
+                            stats.add(time.perf_counter() - started)
+
+                            # Blocks while the enrichment workers are behind (backpressure)
+                            await waits.wait('cards', queue.put(record))
+                
+                            print(f'{i+1}', end=', ')
+                        except Exception:
+                            telemetry.count('errors_total', where='maps.card')
+
+                if batch['ended'] or (MAPS_RESULT_CAP and harvested >= MAPS_RESULT_CAP):
                     break
+                if not cards:
+                    # Nothing new since the last take: wait for the feed to grow
+                    with waits.stage('scroll'), telemetry.span('maps.scroll'):
+                        grew = await waits.wait('scroll', page.wait_for_function(
+                            HARVEST_PENDING_JS, timeout=WAIT_STEP_TIMEOUT_MS, polling=100,
+                        ))
+                    stalls = 0 if grew else stalls + 1
+                    if stalls >= WAIT_MAX_STALLS:
+                        break
+                    await waits.pause('scroll')
+
+            print(f'Results: {harvested}')
+            if not harvested:
+                telemetry.count('selector_misses_total', selector='result_cards')
+            if checkpoint:
+                checkpoint.keyword_scanned(key, keyword, harvested)
+        except Exception:
+            telemetry.count('errors_total', where='maps.keyword')
+
+
+async def scrape_keywords_in_tabs(context, page, keywords, state, city, country, queue, stats,
+                                  dedup_index=None, waits=None, checkpoint=None, maps_url=MAPS_URL,
+                                  center=None, tabs=KEYWORD_TABS):
+    """
+    Maps stage fanned out over up to `tabs` pages of one browser context.
+
+    Consent is accepted once on the first tab before the others open (the
+    context shares its cookies); then every tab takes the next keyword until
+    none are left.
+    """
+    waits = waits or WaitTimer()
+    tabs = max(1, min(tabs, len(keywords)))
+    if tabs == 1:
+        return await scrape_keywords(page, keywords, state, city, country, queue, stats,
+                                     dedup_index, waits, checkpoint, maps_url, center)
+
+    await open_maps(page, waits, maps_url)
+    pages = [page]
+    for _ in range(tabs - 1):
+        tab = await context.new_page()
+        tab.set_default_timeout(30000)
+        pages.append(tab)
+
+    pending = list(keywords)
+
+    async def search(tab):
+        while pending:
+            await scrape_keywords(tab, [pending.pop(0)], state, city, country, queue, stats,
+                                  dedup_index, waits, checkpoint, maps_url, center)
+
+    try:
+        await asyncio.gather(*(search(tab) for tab in pages))
+    finally:
+        for tab in pages[1:]:
+            with contextlib.suppress(Exception):
+                await tab.close()
+
+
+async def run(playwright, state, city, country, keywords=None, client=None, http_session=None,
+              domain_cache=None, page_cache=None, dedup_index=None, browser_pool=None,
+              resource_blocker=None, checkpoint=None, sink=None, exporter=None, scheduler=None,
+              maps_url=MAPS_URL, center=None):
+    """
+    Main scraping function. Navigates Google Maps, extracts business data,
+    and crawls websites for emails.
+    
+    Args:
+        playwright: Playwright instance
+        state: US state name or abbreviation
+        city: City name
+        country: Country (usually "USA")
+        keywords: List of search keywords (default: ["Venture Capital Company"])
+        client: Google Sheets client; used for a Sheets sink if no sink is given (optional)
+        http_session: Shared aiohttp session from create_http_session() (optional)
+        domain_cache: Shared DomainCache (optional)
+        page_cache: Shared PageCache (optional)
+        dedup_index: Shared DedupIndex; known businesses and domains are skipped (optional)
+        browser_pool: Shared BrowserPool; a one-browser pool is used if omitted (optional)
+        resource_blocker: ResourceBlocker for the Maps page; defaults to one built from
+            the BLOCKED_* settings when BLOCK_RESOURCES is on (optional)
+        checkpoint: Shared Checkpoint; an interrupted city resumes where it stopped (optional)
+        sink: Shared SinkWriter the results are written to (optional)
+        exporter: Shared StreamExporter; defaults to one when STREAM_EXPORT is set (optional)
+        scheduler: Shared HostScheduler (per-host limits, circuit breaker, ScraperAPI budget) (optional)
+        maps_url: Google Maps entry page (default: MAPS_URL)
+        center: (latitude, longitude) of the city; direct searches open the map there (optional)
+    
+    Returns:
+        List of business records
+    """
+    if keywords is None:
+        keywords = ["Venture Capital Company"]
+    
+    buffer = RecordBuffer()
 
-                soup = BeautifulSoup(await page.content(), 'lxml')
-                if "end of the list" in soup.text:
-                    break
+    own_session = http_session is None
+    if own_session:
+        http_session = create_http_session()
+    own_cache = domain_cache is None
+    if own_cache:
+        domain_cache = DomainCache()
+    own_page_cache = page_cache is None
+    if own_page_cache:
+        page_cache = PageCache()
+    own_dedup = dedup_index is None
+    if own_dedup:
+        dedup_index = DedupIndex()
+    own_checkpoint = checkpoint is None
+    if own_checkpoint:
+        checkpoint = Checkpoint()
+    own_sink = sink is None and client is not None
+    if own_sink:
+        sink = SinkWriter(SheetsSink(client)).start()
+    own_exporter = exporter is None and STREAM_EXPORT is not None
+    if own_exporter:
+        exporter = StreamExporter(STREAM_EXPORT)
+    own_scheduler = scheduler is None
+    if own_scheduler:
+        scheduler = HostScheduler()
+    fallback_calls = scheduler.fallback.calls
 
-            if errors > 5:
-                continue
-            
-            query = await page.query_selector_all(SELECTORS['result_cards'])
-            print(f'Results: {len(query)}')
-            page.set_default_timeout(3000)
+    # Resources created here are closed even if the city fails
+    try:
+        # Records finished before an interruption are kept, not scraped again
+        key = city_key(state, city, country)
+        for record in checkpoint.load_records(key):
+            buffer.append(record)
+        normalize_buffer(buffer)   # Checkpoints written before batch normalization hold raw values
+        if len(buffer):
+            print(f"Resuming {city}, {state}: {len(buffer)} records from checkpoint")
 
-            # Process each result
-            for i, q in enumerate(query):
-                try:
-                    await q.click()
-                    await asyncio.sleep(1)
-                    soup = BeautifulSoup(await page.content(), 'lxml')
-                    
-                    # Extract title
-                    title = await page.locator(SELECTORS['title_xpath']).inner_text()
-
-                    # Extract category
-                    try:
-                        category = await page.locator(SELECTORS['category_xpath']).inner_text()
-                    except:
-                        category = ''
-
-                    # Extract rating
-                    try:
-                        rating = await page.locator(SELECTORS['rating_xpath']).inner_text()
-                    except Exception:
-                        rating = ""
-                    
-                    # Extract review count
-                    try:
-                        total_reviews = await page.locator(SELECTORS['reviews_xpath']).inner_text()
-                        total_reviews = total_reviews.replace('(', '').replace(')', '')
-                    except Exception:
-                        total_reviews = ""
-
-                    # Extract website
-                    try:
-                        website = await page.locator(SELECTORS['website_link']).first.get_attribute('href')
-                    except Exception:
-                        website = ""
-
-                    # Extract address and phone from aria-labels
-                    address_elements = soup.find_all('button', {'aria-label': re.compile('^Address:', re.IGNORECASE)})
-                    phone_elements = soup.find_all('button', {'aria-label': re.compile('^Phone:*', re.IGNORECASE)})
-
-                    address = aria_label(address_elements).replace('Address:', '').strip()
-                    
-                    # Parse city and state from address
-                    try:
-                        city_ = address.split(',')[-2].strip()
-                        state_abbrev = address.split(',')[-1].split()[0].strip()
-                        state_ = US_STATES.get(state_abbrev, state_abbrev)
-                    except:
-                        city_ = city
-                        state_ = state
-
-                    # Extract phone
-                    try:
-                        phone = aria_label(phone_elements).replace('Phone:', '').strip()
-                    except Exception:
-                        phone = ""
-
-                    # Crawl website for email
-                    email = process_website(website) if website else ''
-                    if not email:
-                        email = ''
-
-                    # Add to dataframe
-                    row = len(df)
-                    df.at[row, 'Keyword'] = keyword
-                    df.at[row, 'Category'] = category
-                    df.at[row, 'Title'] = title
-                    df.at[row, 'State'] = state_
-                    df.at[row, 'City'] = city_
-                    df.at[row, 'Address'] = address
-                    df.at[row, 'Website'] = website
-                    df.at[row, 'Email'] = email
-                    df.at[row, 'Phone'] = phone
-                    df.at[row, 'Rating'] = rating
-                    df.at[row, 'Total Reviews'] = total_reviews
-                    
-                    print(f'{i+1}', end=', ')
-                except Exception:
-                    pass
-        except:
-            pass
+        own_pool = browser_pool is None
+        if own_pool:
+            browser_pool = BrowserPool(playwright, size=1)
 
-    # Validate domains
-    for r in range(len(df)):
-        website = df.at[r, 'Website']
-        domain = clean_url(website) if pd.notna(website) else None
-        valid_url = validate_domain(domain) if domain else None
-        
-        df.at[r, 'Domain'] = domain if domain else ''
-        df.at[r, 'Valid URL'] = valid_url if valid_url else ''
-        data.append(df.iloc[r].tolist())
+        # The context goes back to the pool (and an own pool is closed) even if
+        # setting up the page fails
+        context = None
+        try:
+            context, saved = await browser_pool.acquire(**header_pool().context_options())
+            print(f"Browser pool: {'reused browser' if saved else 'launched browser'}, "
+                  f"~{saved:.1f}s startup saved")
 
-    print(f"\nTotal records: {len(data)}")
-    
-    if client:
-        write_in_row(client, data)
+            if resource_blocker is None and BLOCK_RESOURCES:
+                resource_blocker = ResourceBlocker()
+            if resource_blocker:
+                await resource_blocker.install(context)
+            page = await context.new_page()
+            page.set_default_timeout(30000)
 
-    await context.close()
-    await browser.close()
-    
-    return data
+            # Maps stage produces partial records; workers enrich them while the
+            # browser moves on to the next card; the writer collects finished rows.
+            stats = {name: StageStats(name) for name in ('maps', 'enrich', 'writer')}
+            waits = WaitTimer()
+            records_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            finished_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            workers = [
+                asyncio.create_task(enrichment_worker(records_queue, finished_queue, http_session,
+                                                      stats['enrich'], page_cache, dedup_index,
+                                                      scheduler))
+                for _ in range(ENRICH_CONCURRENCY)
+            ]
+            writer = asyncio.create_task(writer_stage(finished_queue, buffer, stats['writer'],
+                                                      dedup_index, checkpoint, key, exporter))
+
+            maps = asyncio.create_task(scrape_keywords_in_tabs(
+                context, page, keywords, state, city, country, records_queue, stats['maps'], dedup_index,
+                waits, checkpoint, maps_url, center))
+            stages = workers + [writer]
+
+            def stage_done(task):
+                # A dead worker or writer leaves the bounded queues full and the Maps
+                # stage blocked on put(): stop the whole pipeline instead
+                if stage_error([task]) is not None:
+                    maps.cancel()
+                    for other in stages:
+                        other.cancel()
+
+            for task in stages:
+                task.add_done_callback(stage_done)
+            try:
+                await maps
+            except asyncio.CancelledError:
+                if stage_error(stages) is None:
+                    raise
+            finally:
+                await stop_stage(records_queue, workers)
+                await stop_stage(finished_queue, [writer])
+                if exporter:
+                    exporter.sync()
+            error = stage_error(stages)
+            if error is not None:
+                raise error
+        finally:
+            if context is not None:
+                await browser_pool.release(context)
+            if own_pool:
+                await browser_pool.close()
+
+        for stage in stats.values():
+            print(stage.report())
+        print(f"Maps waiting vs working: {waits.report()}")
+        if resource_blocker:
+            print(f"Blocked requests: {resource_blocker.report()}")
+
+        # Validate all domains of this city at once (cached across runs); the
+        # writer already normalized every record and set its domain
+        domains = [d or None for d in buffer.column('domain')]
+        valid_urls = await validate_domains(http_session, domains, cache=domain_cache,
+                                            scheduler=scheduler)
+        print(f"ScraperAPI fallback for {city}: {scheduler.fallback.report(since=fallback_calls)}")
+
+        buffer.set_column('valid_url', [valid_urls.get(d) or '' for d in domains])
+        data = buffer.to_rows()
+
+        print(f"\nTotal records: {len(data)}")
+
+        if sink:
+            await sink.write_rows(data)
+            print(f'Written {len(data)} rows')
+        checkpoint.finish_city(key)
+        return data
+    finally:
+        if own_session:
+            await http_session.close()
+        if own_cache:
+            domain_cache.close()
+        if own_page_cache:
+            print(f"Page cache: {page_cache.stats()}")
+            page_cache.close()
+        if own_dedup:
+            dedup_index.close()
+        if own_checkpoint:
+            checkpoint.close()
+        if own_sink:
+            await sink.close()
+        if own_exporter:
+            exporter.close()
+            print(f"Stream export: {exporter.report()}")
+        if own_scheduler:
+            print(f"Host scheduler: {scheduler.report()}")
 
 # ═══════════════════════════════════════════════════════════════════════════════════
 # PARALLEL PROCESSING
 # ═══════════════════════════════════════════════════════════════════════════════════
 
-async def process_record(sc, states_cities, semaphore, client=None):
+def city_center(states_cities, sc):
+    """(lat, lng) of a States and Cities row, or None without both columns filled."""
+    if not {'Latitude', 'Longitude'} <= set(states_cities.columns):
+        return None
+    lat, lng = states_cities.at[sc, 'Latitude'], states_cities.at[sc, 'Longitude']
+    if pd.notna(lat) and pd.notna(lng) and str(lat).strip() and str(lng).strip():
+        try:
+            return float(lat), float(lng)
+        except ValueError:
+            print(f"Ignoring invalid center {lat!r}, {lng!r} in row {sc + 2}")
+    return None
+
+
+async def process_record(sc, states_cities, semaphore, client=None, http_session=None,
+                         domain_cache=None, page_cache=None, dedup_index=None, browser_pool=None,
+                         checkpoint=None, sink=None, exporter=None, scheduler=None):
     """Process a single city/state record with semaphore rate limiting."""
     if states_cities.at[sc, 'Status'] in ['Done']:
         return
@@ -590,16 +3294,28 @@ async def process_record(sc, states_cities, semaphore, client=None):
             state = states_cities.at[sc, 'State']
             city = states_cities.at[sc, 'City']
             country = states_cities.at[sc, 'Country']
+            center = city_center(states_cities, sc)
 
-            async with async_playwright() as playwright:
-                await run(playwright, state, city, country, client=client)
+            kwargs = dict(client=client, http_session=http_session, domain_cache=domain_cache,
+                          page_cache=page_cache, dedup_index=dedup_index, checkpoint=checkpoint,
+                          sink=sink, exporter=exporter, scheduler=scheduler, center=center)
+            with profile_city(city_key(state, city, country)), telemetry.span('city'):
+                if browser_pool:
+                    await run(browser_pool.playwright, state, city, country,
+                              browser_pool=browser_pool, **kwargs)
+                else:
+                    async with async_playwright() as playwright:
+                        await run(playwright, state, city, country, **kwargs)
             
-            if client:
-                write_in_cell(client, sc + 2, 'Done')
+            if sink:
+                await sink.set_status(sc + 2, 'Done')
         except Exception as e:
-            if client:
-                write_in_cell(client, sc + 2, 'Error')
             print(f"Error processing {city}, {state}: {e}")
+            if sink:
+                try:
+                    await sink.set_status(sc + 2, 'Error')
+                except Exception:
+                    pass
 
 
 async def main():
@@ -609,25 +3325,1148 @@ async def main():
     
     if states_cities.empty:
         print("No data found. Running demo mode...")
-        async with async_playwright() as playwright:
-            results = await run(
-                playwright, 
-                state="California",
-                city="San Francisco",
-                country="USA",
-                keywords=["Venture Capital Company"]
-            )
-            print(f"Demo results: {results}")
+        # Local backends work without Google Sheets
+        sink = SinkWriter(make_sink(SINK_BACKEND)).start() if SINK_BACKEND != 'sheets' else None
+        try:
+            async with async_playwright() as playwright:
+                results = await run(
+                    playwright,
+                    state="California",
+                    city="San Francisco",
+                    country="USA",
+                    keywords=["Venture Capital Company"],
+                    sink=sink,
+                )
+                print(f"Demo results: {results}")
+        finally:
+            if sink:
+                await sink.close()
+                print(f"Sink: {sink.rows_written} rows in {sink.writes} writes")
         return
     
-    semaphore = asyncio.Semaphore(5)  # Max 5 concurrent browsers
+    if SHARD_WORKERS > 1:
+        sink = SinkWriter(make_sink(SINK_BACKEND, client)).start()
+        await run_sharded(states_cities, sink, SHARD_WORKERS)
+        await sink.close()
+        print(f"Sink: {sink.rows_written} rows in {sink.writes} writes")
+        return
+
+    semaphore = asyncio.Semaphore(5)  # Max 5 cities at once (browsers come from the pool)
+    metrics_server = await telemetry.serve(TELEMETRY_PORT) if TELEMETRY_PORT else None
+
+    # One browser pool, one pooled HTTP client and one set of caches are shared by every city
+    domain_cache = DomainCache()
+    page_cache = PageCache()
+    dedup_index = DedupIndex()
+    checkpoint = Checkpoint()
+    sink = SinkWriter(make_sink(SINK_BACKEND, client)).start()
+    exporter = StreamExporter(STREAM_EXPORT) if STREAM_EXPORT else None
+    scheduler = HostScheduler()
+    async with async_playwright() as playwright, create_http_session() as http_session:
+        browser_pool = BrowserPool(playwright)
+        tasks = [
+            asyncio.create_task(process_record(i, states_cities, semaphore, client, http_session,
+                                               domain_cache, page_cache, dedup_index, browser_pool,
+                                               checkpoint, sink, exporter, scheduler))
+            for i in range(len(states_cities))
+        ]
+
+        await asyncio.gather(*tasks)
+        await browser_pool.close()
+        print(f"Browser pool: {browser_pool.report()}")
+    await sink.close()
+    print(f"Sink: {sink.rows_written} rows in {sink.writes} writes")
+    if exporter:
+        exporter.close()
+        print(f"Stream export: {exporter.report()}")
+    print(f"Host scheduler: {scheduler.report()}")
+    domain_cache.close()
+    dedup_index.close()
+    checkpoint.close()
+    print(f"Page cache: {page_cache.stats()}")
+    page_cache.close()
+
+    print(f"Telemetry: {telemetry.report()}")
+    if TELEMETRY_JSON:
+        telemetry.write_json(TELEMETRY_JSON)
+    if metrics_server:
+        await metrics_server.cleanup()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# SHARDED EXECUTION (work queue, worker processes, coordinator)
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+class WorkQueue:
+    """
+    SQLite job list of cities, keyed by their States and Cities sheet row.
+
+    Workers claim() a city under a lease (renewed while they work), then
+    finish() it with its result rows; the coordinator merges finished jobs
+    into the sink. Expired leases go back to the pool, so a crashed worker's
+    city is picked up again. Any process or machine that can open the file
+    can pull from it.
+    """
 
-    tasks = [
-        asyncio.create_task(process_record(i, states_cities, semaphore, client))
-        for i in range(len(states_cities))
+    def __init__(self, path=None, lease_seconds=WORK_QUEUE_LEASE):
+        self.path = path or os.path.join(CACHE_DIR, "work_queue.sqlite3")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "row INTEGER PRIMARY KEY, state TEXT, city TEXT, country TEXT, "
+            "latitude REAL, longitude REAL, "
+            "status TEXT NOT NULL DEFAULT 'pending', worker TEXT, leased_at REAL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, result TEXT, merged INTEGER NOT NULL DEFAULT 0)"
+        )
+        # Queue files created before jobs carried the city center
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        for column in ('latitude', 'longitude'):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} REAL")
+
+    def add(self, jobs):
+        """
+        Queue (row, state, city, country, latitude, longitude) jobs.
+        Latitude/longitude are None without a center.
+
+        The sheet is the source of truth: a row already in the queue is queued
+        again unless it is still in flight for the same city (leased, or
+        finished but not merged yet). A row that now holds another city is
+        always reset, and a stale worker can no longer finish() it.
+        """
+        self.conn.executemany(
+            "INSERT INTO jobs (row, state, city, country, latitude, longitude) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(row) DO UPDATE SET status = 'pending', merged = 0, result = NULL, "
+            "worker = NULL, leased_at = NULL, state = excluded.state, city = excluded.city, "
+            "country = excluded.country, latitude = excluded.latitude, longitude = excluded.longitude "
+            "WHERE merged = 1 OR status = 'pending' OR state IS NOT excluded.state "
+            "OR city IS NOT excluded.city OR country IS NOT excluded.country",
+            jobs,
+        )
+
+    def claim(self, worker):
+        """Lease the next available job; returns (row, state, city, country, center) or None."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            job = self.conn.execute(
+                "SELECT row, state, city, country, latitude, longitude FROM jobs "
+                "WHERE status = 'pending' OR (status = 'leased' AND leased_at < ?) "
+                "ORDER BY row LIMIT 1",
+                (now - self.lease_seconds,),
+            ).fetchone()
+            if job:
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'leased', worker = ?, leased_at = ?, "
+                    "attempts = attempts + 1 WHERE row = ?",
+                    (worker, now, job[0]),
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        if job is None:
+            return None
+        row, state, city, country, lat, lng = job
+        return row, state, city, country, (lat, lng) if lat is not None and lng is not None else None
+
+    def renew(self, row, worker):
+        self.conn.execute(
+            "UPDATE jobs SET leased_at = ? WHERE row = ? AND worker = ? AND status = 'leased'",
+            (time.time(), row, worker),
+        )
+
+    def finish(self, row, worker, status, rows=None):
+        """Store a job's outcome ('done' or 'error') and its result rows, if `worker` still holds it."""
+        self.conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, leased_at = NULL "
+            "WHERE row = ? AND worker = ? AND status = 'leased'",
+            (status, json.dumps(rows) if rows is not None else None, row, worker),
+        )
+
+    def unmerged(self):
+        """Finished jobs the coordinator has not written yet: [(row, status, rows)]."""
+        return [
+            (row, status, json.loads(result) if result else [])
+            for row, status, result in self.conn.execute(
+                "SELECT row, status, result FROM jobs "
+                "WHERE status IN ('done', 'error') AND merged = 0 ORDER BY row"
+            )
+        ]
+
+    def mark_merged(self, row):
+        self.conn.execute("UPDATE jobs SET merged = 1, result = NULL WHERE row = ?", (row,))
+
+    def active(self):
+        """Jobs currently leased by a live (recently heartbeating) worker."""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'leased' AND leased_at >= ?",
+            (time.time() - self.lease_seconds,),
+        ).fetchone()[0]
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+    def close(self):
+        self.conn.close()
+
+
+async def shard_worker(queue_path=None, worker=None, concurrency=SHARD_CITY_CONCURRENCY,
+                       fallback_budget=SCRAPERAPI_BUDGET):
+    """
+    Pull cities from the WorkQueue until it is empty.
+
+    Runs its own event loop resources (browser pool, HTTP client, scheduler);
+    the SQLite caches, dedup index and checkpoint are shared with the other
+    workers through their files. Results go back into the queue.
+    """
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    queue = WorkQueue(queue_path)
+    domain_cache = DomainCache()
+    page_cache = PageCache()
+    dedup_index = DedupIndex()
+    checkpoint = Checkpoint()
+    exporter = StreamExporter(STREAM_EXPORT) if STREAM_EXPORT else None
+    scheduler = HostScheduler(fallback_budget=ScraperApiBudget(fallback_budget))
+    cities = 0
+
+    async def heartbeat(row):
+        while True:
+            await asyncio.sleep(queue.lease_seconds / 3)
+            queue.renew(row, worker)
+
+    async with async_playwright() as playwright, create_http_session() as http_session:
+        browser_pool = BrowserPool(playwright)
+
+        async def work():
+            nonlocal cities
+            while True:
+                job = queue.claim(worker)
+                if job is None:
+                    return
+                row, state, city, country, center = job
+                beat = asyncio.create_task(heartbeat(row))
+                try:
+                    with profile_city(city_key(state, city, country)), telemetry.span('city'):
+                        data = await run(playwright, state, city, country, http_session=http_session,
+                                         domain_cache=domain_cache, page_cache=page_cache,
+                                         dedup_index=dedup_index, browser_pool=browser_pool,
+                                         checkpoint=checkpoint, exporter=exporter, scheduler=scheduler,
+                                         center=center)
+                    queue.finish(row, worker, 'done', data)
+                    cities += 1
+                except Exception as e:
+                    print(f"[{worker}] Error processing {city}, {state}: {e}")
+                    queue.finish(row, worker, 'error')
+                finally:
+                    beat.cancel()
+
+        await asyncio.gather(*(work() for _ in range(concurrency)))
+        await browser_pool.close()
+
+    print(f"[{worker}] {cities} cities; host scheduler: {scheduler.report()}")
+    if TELEMETRY_JSON:
+        telemetry.write_json(f"{os.path.splitext(TELEMETRY_JSON)[0]}-{worker}.json")
+    if exporter:
+        exporter.close()
+    for store in (domain_cache, page_cache, dedup_index, checkpoint, queue):
+        store.close()
+
+
+def shard_worker_main(queue_path, worker, fallback_budget):
+    """Process entry point for a local shard worker."""
+    asyncio.run(shard_worker(queue_path, worker, fallback_budget=fallback_budget))
+
+
+async def merge_finished(queue, sink):
+    """Write finished jobs' rows and statuses to the sink; returns how many were merged."""
+    finished = queue.unmerged()
+    for row, status, data in finished:
+        if status == 'done':
+            await sink.write_rows(data)
+        await sink.set_status(row, 'Done' if status == 'done' else 'Error')
+        queue.mark_merged(row)
+    return len(finished)
+
+
+async def run_sharded(states_cities, sink, workers=SHARD_WORKERS, queue_path=None):
+    """
+    Coordinator: (re)queue every city not marked Done in the sheet, start `workers` local worker
+    processes and merge their results into the sink as cities finish.
+
+    More machines can join by running `python google_maps_business_scraper.py
+    worker <queue_path>` against the same queue file; the coordinator keeps
+    merging while any worker holds a live lease.
+    """
+    queue = WorkQueue(queue_path)
+    queue.add(
+        (sc + 2, states_cities.at[sc, 'State'], states_cities.at[sc, 'City'],
+         states_cities.at[sc, 'Country'], *(city_center(states_cities, sc) or (None, None)))
+        for sc in range(len(states_cities))
+        if states_cities.at[sc, 'Status'] not in ['Done']
+    )
+
+    budget = None if SCRAPERAPI_BUDGET is None else max(1, SCRAPERAPI_BUDGET // workers)
+    spawn = multiprocessing.get_context('spawn')
+    processes = [
+        spawn.Process(target=shard_worker_main, name=f"shard-{i}",
+                      args=(queue.path, f"{socket.gethostname()}-shard{i}", budget))
+        for i in range(workers)
     ]
+    for process in processes:
+        process.start()
+
+    merged = 0
+    while True:
+        merged += await merge_finished(queue, sink)
+        if not any(p.is_alive() for p in processes) and not queue.active():
+            merged += await merge_finished(queue, sink)
+            break
+        await asyncio.sleep(SHARD_POLL_SECONDS)
+
+    for process in processes:
+        process.join()
+    print(f"Sharded run: {merged} cities merged from {workers} workers; jobs: {queue.counts()}")
+    queue.close()
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# BENCHMARKS
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+def _legacy_is_valid_email(email):
+    """Reference copy of the original validator (benchmark baseline only)."""
+    if not email or not re.match(EMAIL_REGEX, email):
+        return False
+    if email[0].isdigit():
+        return False
+    for exclusion in EMAIL_EXCLUSIONS:
+        if exclusion in email.lower():
+            return False
+    extension = email.split('.')[-1].lower()
+    if extension in FILE_EXTENSIONS:
+        return False
+    return True
+
+
+def _legacy_extract_emails(text):
+    """Reference copy of the original BeautifulSoup extractor (benchmark baseline only)."""
+    from bs4 import BeautifulSoup
+    emails = set()
+    soup = BeautifulSoup(text, 'lxml')
+    for link in soup.find_all("a", href=True):
+        href = link["href"]
+        if href.startswith("mailto:"):
+            email = href[7:].split('?')[0].split('#')[0]
+            email = unquote(email).strip()
+            if _legacy_is_valid_email(email):
+                emails.add(email)
+    for email in re.findall(EMAIL_REGEX, text):
+        email = unquote(email).strip()
+        if _legacy_is_valid_email(email):
+            emails.add(email)
+    return emails
+
+
+# Labelled pages for the email benchmark: (html, emails a correct extractor returns)
+EMAIL_BENCH_CASES = (
+    ('<a href="mailto:x@acme.com&amp;cc=y@acme.com">Mail</a>', {'x@acme.com', 'y@acme.com'}),
+    ('<a href="mailto:x@acme.com?subject=Hi">Mail</a>', {'x@acme.com'}),
+    ('<a href="mailto:info@acme.com;sales@acme.com">Mail</a>', {'info@acme.com', 'sales@acme.com'}),
+    ('<a href="mailto:a@b.com,c@d.com">Mail</a>', {'a@b.com', 'c@d.com'}),
+    ('<a href="mailto:info%40acme.com">Mail</a>', {'info@acme.com'}),
+    ('<p>(write to info@acme.com)</p>', {'info@acme.com'}),
+    ('<a href="mailto:info@acme.com)">Mail</a>', {'info@acme.com'}),
+    ('<p>Contact: office@shop.co.uk.</p>', {'office@shop.co.uk'}),
+    ('<img src="logo@2x.png"><p>noreply@example.com</p>', set()),
+    ('<p>user@mail.wixpress.com 1st@acme.com</p>', set()),
+    ('<footer>Email <a href="mailto:Hello@Studio.io">Hello@Studio.io</a></footer>', {'Hello@Studio.io'}),
+)
+
+
+def benchmark_extract_emails(corpus_dir=None, repeat=3):
+    """
+    Compare extract_emails against the original extractor.
+
+    Every *.htm / *.html file under corpus_dir is read once (the pages of the
+    synthetic contact-benchmark sites without one), plus the labelled
+    EMAIL_BENCH_CASES; both extractors run `repeat` times over the whole corpus.
+    Prints time per page, speedup, any emails only one of them found, and
+    precision / recall of each on the labelled cases.
+    """
+    pages = []
+    for root, _, files in os.walk(corpus_dir) if corpus_dir else ():
+        for name in sorted(files):
+            if name.lower().endswith(('.htm', '.html')):
+                with open(os.path.join(root, name), 'rb') as f:
+                    pages.append(f.read().decode('utf-8', 'replace'))
+    if corpus_dir and not pages:
+        print(f"No .html files found in {corpus_dir}")
+    if not corpus_dir:
+        pages += [html for site in _contact_fixture_sites()[0].values() for html in site.values()]
+    pages += [html for html, _ in EMAIL_BENCH_CASES]
+
+    def timed(extractor):
+        found = []
+        started = time.perf_counter()
+        for _ in range(repeat):
+            found = [extractor(page) for page in pages]
+        return (time.perf_counter() - started) / (repeat * len(pages)), found
+
+    legacy_time, legacy_found = timed(_legacy_extract_emails)
+    new_time, new_found = timed(extract_emails)
+
+    only_legacy = sum(len(a - b) for a, b in zip(legacy_found, new_found))
+    only_new = sum(len(b - a) for a, b in zip(legacy_found, new_found))
+    result = {
+        'pages': len(pages),
+        'megabytes': sum(len(p) for p in pages) / 1e6,
+        'legacy_ms_per_page': legacy_time * 1000,
+        'new_ms_per_page': new_time * 1000,
+        'speedup': legacy_time / new_time if new_time else float('inf'),
+        'emails_legacy': sum(len(f) for f in legacy_found),
+        'emails_new': sum(len(f) for f in new_found),
+        'only_legacy': only_legacy,
+        'only_new': only_new,
+    }
+    labelled = list(zip((truth for _, truth in EMAIL_BENCH_CASES),
+                        zip(legacy_found[-len(EMAIL_BENCH_CASES):], new_found[-len(EMAIL_BENCH_CASES):])))
+    relevant = sum(len(truth) for truth, _ in labelled)
+    for name, index in (('legacy', 0), ('new', 1)):
+        found = sum(len(pair[index]) for _, pair in labelled)
+        correct = sum(len(pair[index] & truth) for truth, pair in labelled)
+        result[f'{name}_precision'] = correct / found if found else 1.0
+        result[f'{name}_recall'] = correct / relevant if relevant else 1.0
+    for key, value in result.items():
+        print(f"{key:>20}: {value:.3f}" if isinstance(value, float) else f"{key:>20}: {value}")
+    return result
+
+
+def _legacy_normalize_row(record):
+    """The original per-record post-processing from run() / scrape_keywords()."""
+    address = record.business_address.replace('Address:', '').strip()
+    try:
+        city_ = address.split(',')[-2].strip()
+        state_abbrev = address.split(',')[-1].split()[0].strip()
+        state_ = US_STATES.get(state_abbrev, state_abbrev)
+    except:
+        city_ = record.business_city
+        state_ = record.business_state
+    total_reviews = record.review_count.replace('(', '').replace(')', '')
+    try:
+        extracted = tldextract.extract(record.business_website)
+        domain = f"{extracted.domain}.{extracted.suffix}" if extracted.domain and extracted.suffix else None
+    except Exception:
+        domain = None
+    emails = '\n'.join(e for e in record.business_email.split('\n') if is_valid_email(e))
+    return city_, state_, total_reviews, domain, emails
+
+
+def _synthetic_records(rows, domains=5000, seed=7):
+    """Maps-like records: US/foreign addresses, review counts, websites, emails."""
+    rng = random.Random(seed)
+    states = list(US_STATES.items())
+    records = []
+    for n in range(rows):
+        abbrev, name = states[n % len(states)]
+        site = n % domains
+        style = n % 10
+        if style < 7:
+            address = f"Address: {100 + n % 900} Main St, City {site % 300}, {abbrev} {10000 + n % 89999}"
+        elif style < 9:
+            address = f"{n % 50} Oak Ave, Town {site % 80}, {name}"
+        else:
+            address = f"{n % 20} Rue X, 750{n % 20:02d} Paris, France"
+        website = ('' if n % 11 == 0 else
+                   f"https://{'www.' if n % 2 else 'shop.'}biz{site}.{('com', 'co.uk', 'net')[site % 3]}/?p={n}")
+        emails = '' if site % 4 == 0 else '\n'.join(   # Found per website, like the crawler
+            [f"info@biz{site}.com", f"sales{site % 7}@biz{site}.com", "logo@2x.png", "noreply@example.com"][:site % 4 + 1])
+        records.append(BusinessLeadRecord(
+            business_address=address, business_city='Searched', business_state=abbrev,
+            business_website=website, business_email=emails,
+            rating=f"{3 + rng.random() * 2:.1f}" if n % 13 else '',
+            review_count=f"({rng.randint(1, 5000):,})",
+        ))
+    return records
+
+
+def benchmark_normalize(rows=100_000):
+    """
+    Time the original per-record post-processing against normalize_buffer() on
+    `rows` synthetic records (memo caches cleared first). `rows_differing` counts
+    rows whose city, state or domain differ; these are addresses the original
+    comma split gets wrong ("New" for New Hampshire, foreign addresses).
+    """
+    records = _synthetic_records(rows)
+    warm_up = RecordBuffer()   # Import pandas / pyarrow and load the suffix list outside the timings
+    for record in _synthetic_records(10):
+        warm_up.append(record)
+    normalize_buffer(warm_up)
+    tldextract.extract('warm.up.example.com')   # The original path uses the default extractor
+
+    started = time.perf_counter()
+    legacy = [_legacy_normalize_row(record) for record in records]
+    legacy_time = time.perf_counter() - started
+
+    buffer = RecordBuffer()
+    for record in records:
+        buffer.append(record)
+    registered_domain.cache_clear()
+    started = time.perf_counter()
+    normalize_buffer(buffer)
+    new_time = time.perf_counter() - started
+
+    new = zip(buffer.column('business_city'), buffer.column('business_state'), buffer.column('domain'))
+    differs = sum((city, state, domain or None) != (old[0], old[1], old[3])
+                  for (city, state, domain), old in zip(new, legacy))
+    result = {
+        'rows': rows,
+        'legacy_seconds': legacy_time,
+        'new_seconds': new_time,
+        'legacy_rows_per_sec': rows / legacy_time,
+        'new_rows_per_sec': rows / new_time,
+        'speedup': legacy_time / new_time if new_time else float('inf'),
+        'rows_differing': differs,
+    }
+    for key, value in result.items():
+        print(f"{key:>20}: {value:.3f}" if isinstance(value, float) else f"{key:>20}: {value}")
+    return result
+
+
+def benchmark_startup(repeat=5):
+    """
+    Cold-start time of each stage subcommand: a fresh interpreter runs
+    `<stage> --dry-run` (module import, configuration and the stage's
+    STAGE_IMPORTS) `repeat` times. The baseline imports every heavy dependency
+    up front, as the module used to. Prints the median seconds of each.
+    """
+    script = os.path.abspath(__file__)
+    eager = "import pandas, aiohttp, tldextract, bs4, lxml, fake_useragent, playwright.async_api"
+    commands = {'eager imports': [sys.executable, '-c', eager],
+                'module + --help': [sys.executable, script, '--help']}
+    for stage in STAGE_IMPORTS:
+        commands[stage] = [sys.executable, script, stage, '--dry-run']
+
+    result = {}
+    for name, command in commands.items():
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            subprocess.run(command, capture_output=True, check=True)
+            times.append(time.perf_counter() - started)
+        result[name] = statistics.median(times)
+        print(f"{name:>20}: {result[name]:.3f}s")
+    return result
+
+
+class _FixtureResponse:
+    def __init__(self, status, text):
+        self.status = status
+        self._text = text
+        self.headers = {}
+
+    async def text(self, errors='strict'):
+        return self._text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _FixtureSession:
+    """
+    Stands in for the aiohttp session in benchmarks: serves saved pages from
+    <fixture_dir>/<domain>/<path>.html (index.html for "/"), or from a
+    {domain: {path: html}} dict of generated sites, and counts requests.
+    """
+
+    def __init__(self, fixture_dir=None, sites=None):
+        self.fixture_dir = fixture_dir
+        self.sites = sites
+        self.requests = 0
+
+    def get(self, url, headers=None, params=None):
+        self.requests += 1
+        if params and 'url' in params:   # ScraperAPI fallback
+            url = params['url']
+        parsed = urlparse(url)
+        host = (parsed.hostname or '').removeprefix('www.')
+        path = parsed.path.strip('/')
+        if self.sites is not None:
+            html = self.sites.get(host, {}).get(path)
+            return _FixtureResponse(200, html) if html is not None else _FixtureResponse(404, '')
+        for name in (f"{path}.html", os.path.join(path, "index.html")) if path else ("index.html",):
+            file_path = os.path.join(self.fixture_dir, host, name)
+            if os.path.isfile(file_path):
+                with open(file_path, encoding='utf-8', errors='replace') as f:
+                    return _FixtureResponse(200, f.read())
+        return _FixtureResponse(404, '')
+
+
+def _contact_fixture_sites(count=CONTACT_BENCH_SITES):
+    """
+    Labelled synthetic websites for the contact benchmark.
+
+    Returns ({domain: {path: html}}, {domain: emails}). Eight layouts cycle:
+    email on the homepage, behind a nav "Contact" link, an Impressum footer
+    link, an unlinked /contact page, an About page linked outside the footer,
+    a footer "Get in touch" link, a free-mail address on a contact page, and
+    no email at all. Every homepage also has a row of unrelated footer links.
+    """
+    noise = ('privacy', 'terms', 'blog', 'careers', 'faq', 'press', 'shipping', 'returns')
+    sites, truth = {}, {}
+    for n in range(count):
+        domain = f"fixture-biz{n}.com"
+        pages = {p: '<p>Nothing to see here.</p>' * 20 for p in noise}
+        nav, body, footer = '', '<p>Welcome to our business.</p>' * 40, ''
+        emails = set()
+        kind = n % 8
+        if kind == 0:
+            emails.add(f"info@{domain}")
+            footer += f'<a href="mailto:info@{domain}">Email us</a>'
+        elif kind == 1:
+            emails.add(f"hello@{domain}")
+            nav += '<a href="/contact-us">Contact</a>'
+            pages['contact-us'] = f'<p>Write to hello@{domain}</p>'
+        elif kind == 2:
+            emails.add(f"office@{domain}")
+            footer += '<a href="/impressum">Impressum</a>'
+            pages['impressum'] = f'<p>Verantwortlich: office@{domain}</p>'
+        elif kind == 3:
+            emails.add(f"mail@{domain}")
+            pages['contact'] = f'<p>mail@{domain}</p>'
+        elif kind == 4:
+            emails.add(f"team@{domain}")
+            nav += '<a href="/about">About us</a>'
+            pages['about'] = f'<p>Meet the team: team@{domain}</p>'
+        elif kind == 5:
+            emails.add(f"bookings@{domain}")
+            footer += '<a href="/reach">Get in touch</a>'
+            pages['reach'] = f'<p>bookings@{domain}</p>'
+        elif kind == 6:
+            emails.add(f"fixturebiz{n}@gmail.com")
+            nav += '<a href="/contact">Contact</a>'
+            pages['contact'] = f'<p>fixturebiz{n}@gmail.com</p>'
+        footer += ''.join(f'<a href="/{p}">{p}</a>' for p in noise)
+        pages[''] = f'<html><nav>{nav}</nav>{body}<footer>{footer}</footer></html>'
+        sites[domain] = pages
+        truth[domain] = emails
+    return sites, truth
+
+
+def benchmark_contact_discovery(fixture_dir=None, count=CONTACT_BENCH_SITES):
+    """
+    Compare ranked contact discovery with the exhaustive crawl.
+
+    Without fixture_dir, `count` labelled sites from _contact_fixture_sites
+    are crawled and recall is measured against their labels. fixture_dir
+    holds one folder per saved site, named after its domain, with pages saved
+    by URL path (index.html, contact.html, about/team.html, ...); there the
+    truth set is every email either strategy found. Prints requests per site,
+    site and email recall of both strategies.
+    """
+    if fixture_dir:
+        sites = {}
+        truth = None
+        domains = sorted(d for d in os.listdir(fixture_dir) if os.path.isdir(os.path.join(fixture_dir, d)))
+        if not domains:
+            print(f"No site folders found in {fixture_dir}")
+            return None
+    else:
+        sites, truth = _contact_fixture_sites(count)
+        domains = sorted(sites)
+
+    async def crawl_all(crawl):
+        found, requests = [], 0
+        for domain in domains:
+            session = _FixtureSession(fixture_dir, None if fixture_dir else sites)
+            emails = await crawl(session, domain, f"https://{domain}/")
+            found.append(set(emails or ()))
+            requests += session.requests
+        return found, requests
+
+    async def compare():
+        return (await crawl_all(crawl_footer_links), await crawl_all(discover_contact_emails))
+
+    (legacy_found, legacy_requests), (ranked_found, ranked_requests) = asyncio.run(compare())
+    if truth is None:
+        expected = [a | b for a, b in zip(legacy_found, ranked_found)]
+    else:
+        expected = [truth[domain] for domain in domains]
+    with_email = [i for i, emails in enumerate(expected) if emails]
+    relevant = sum(len(emails) for emails in expected)
+
+    def recall(found):
+        sites_found = sum(1 for i in with_email if found[i] & expected[i])
+        emails_found = sum(len(f & e) for f, e in zip(found, expected))
+        return (sites_found / len(with_email) if with_email else 1.0,
+                emails_found / relevant if relevant else 1.0)
+
+    (legacy_site_recall, legacy_email_recall), (ranked_site_recall, ranked_email_recall) = \
+        recall(legacy_found), recall(ranked_found)
+    result = {
+        'sites': len(domains),
+        'truth': 'labelled' if truth is not None else 'union of both strategies',
+        'sites_with_email': len(with_email),
+        'exhaustive_requests_per_site': legacy_requests / len(domains),
+        'ranked_requests_per_site': ranked_requests / len(domains),
+        'request_reduction': 1 - ranked_requests / legacy_requests if legacy_requests else 0.0,
+        'exhaustive_site_recall': legacy_site_recall,
+        'ranked_site_recall': ranked_site_recall,
+        'exhaustive_email_recall': legacy_email_recall,
+        'ranked_email_recall': ranked_email_recall,
+        'only_exhaustive': sum(len(a - b) for a, b in zip(legacy_found, ranked_found)),
+        'only_ranked': sum(len(b - a) for a, b in zip(legacy_found, ranked_found)),
+    }
+    for key, value in result.items():
+        print(f"{key:>30}: {value:.3f}" if isinstance(value, float) else f"{key:>30}: {value}")
+    return result
+
+
+def benchmark_headers(requests=2000, legacy_requests=50):
+    """
+    Per-request header overhead: a new UserAgent() per call (original) versus
+    the preloaded HeaderPool. Prints microseconds per request and the one-off
+    pool build time.
+    """
+    from fake_useragent import UserAgent
+    hosts = [f"site{i}.example.com" for i in range(200)]
+
+    started = time.perf_counter()
+    for _ in range(legacy_requests):
+        headers = {"User-Agent": UserAgent().random}
+    legacy = (time.perf_counter() - started) / legacy_requests
+
+    started = time.perf_counter()
+    pool = HeaderPool()
+    build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(requests):
+        pool.for_host(hosts[i % len(hosts)])
+    pooled = (time.perf_counter() - started) / requests
+
+    result = {
+        'legacy_us_per_request': legacy * 1e6,
+        'pool_build_ms': build * 1000,
+        'pooled_us_per_request': pooled * 1e6,
+        'speedup': legacy / pooled if pooled else float('inf'),
+        'profiles': len(pool.profiles),
+    }
+    for key, value in result.items():
+        print(f"{key:>22}: {value:.3f}" if isinstance(value, float) else f"{key:>22}: {value}")
+    return result
+
+
+# Offline stand-in for the Maps search page: same search box, .hfpxzc cards,
+# detail-panel XPaths (SELECTORS), Address/Phone aria-labels and end marker.
+# Scrolling the feed to its end loads the next batch.
+_BENCH_MAPS_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Maps stand-in</title></head><body>
+<input id="searchboxinput">
+<style>#feed { height: 400px; overflow-y: auto; } .hfpxzc { display: block; height: 60px; }</style>
+<div role="feed" id="feed"></div>
+<div id="QA0Szd"><div><div><div><div></div><div></div><div><div><div><div><div>
+  <div></div><div><div></div><div><div><div id="panel"></div></div></div></div>
+</div></div></div></div></div></div></div></div>
+<div id="contact"></div>
+<script>
+const TOTAL = __TOTAL__, BATCH = __BATCH__, SITES = '__SITES__';
+const feed = document.getElementById('feed');
+let offset = 0;   // Each query gets its own businesses
+const placeId = (n) => '0x' + (0x89c259a61c75 + n).toString(16) + ':0x' + (0x79d31adb1233 + n).toString(16);
+function addBatch() {
+  const start = feed.querySelectorAll('.hfpxzc').length;
+  for (let i = start; i < Math.min(start + BATCH, TOTAL); i++) {
+    const n = offset + i, a = document.createElement('a');
+    a.className = 'hfpxzc';
+    a.href = '/maps/place/Business+' + n + '/data=!4m7!3m6!1s' + placeId(n) + '!8m2';
+    a.textContent = 'Business ' + n;
+    a.addEventListener('click', (e) => { e.preventDefault(); open(n, a); });
+    feed.appendChild(a);
+  }
+  if (feed.querySelectorAll('.hfpxzc').length >= TOTAL && !document.getElementById('end')) {
+    const end = document.createElement('p');
+    end.id = 'end';
+    end.textContent = "You've reached the end of the list.";
+    feed.appendChild(end);
+  }
+}
+function open(n, a) {
+  history.replaceState(null, '', a.getAttribute('href'));
+  setTimeout(() => {
+    document.getElementById('panel').innerHTML =
+      '<div><h1>Business ' + n + '</h1></div>' +
+      '<div><div><div><div></div><div><span><span>' + (3 + (n % 20) / 10).toFixed(1) + '</span></span>' +
+      '<span><span><span>(' + (10 + n * 7) + ')</span></span></span></div></div>' +
+      '<div><span><span><button>Coffee shop</button></span></span></div></div></div>';
+    document.getElementById('contact').innerHTML =
+      '<button aria-label="Address: ' + (100 + n) + ' Main St, Springfield, CA 9' + String(n).padStart(4, '0') + '"></button>' +
+      '<button aria-label="Phone: +1 555-' + String(n).padStart(4, '0') + '"></button>' +
+      '<a class="CsEnBe" href="' + SITES.replace('{n}', n) + '">site</a>';
+  }, 30);
+}
+let loading = false;
+feed.addEventListener('scroll', () => {
+  if (loading || feed.scrollTop + feed.clientHeight < feed.scrollHeight - 5) return;
+  loading = true;
+  setTimeout(() => { addBatch(); loading = false; }, 150);
+});
+function search(query) {
+  offset = [...query].reduce((h, c) => (h * 31 + c.charCodeAt(0)) % 997, 0) * TOTAL;
+  setTimeout(addBatch, 200);
+}
+document.getElementById('searchboxinput').addEventListener('keydown', (e) => {
+  if (e.key === 'Enter') search(e.target.value);
+});
+const direct = location.pathname.match(/^\/maps\/search\/([^\/]+)/);
+if (direct) search(decodeURIComponent(direct[1].replace(/\+/g, ' ')));
+</script></body></html>
+"""
+
+
+def _bench_site_pages(n):
+    """Synthetic business website n: {path: html}. Five layouts, most with an email."""
+    domain = f"bench-biz{n}.com"
+    footer = ''.join(f'<a href="/{p}">{p}</a>' for p in
+                     ('privacy', 'terms', 'blog', 'careers', 'faq', 'press', 'shipping', 'returns'))
+    pages = {p: '<p>Nothing to see here.</p>' * 50 for p in
+             ('privacy', 'terms', 'blog', 'careers', 'faq', 'press', 'shipping', 'returns')}
+    nav, body = '', '<p>Welcome to our business.</p>' * 100
+    kind = n % 5
+    if kind == 0:
+        body += f'<a href="mailto:info@{domain}">Email us</a>'
+    elif kind == 1:
+        nav = '<a href="/contact-us">Contact</a><a href="/about">About</a>'
+        pages['contact-us'] = f'<p>Write to hello@{domain}</p>'
+        pages['about'] = '<p>Our team.</p>'
+    elif kind == 2:
+        footer += '<a href="/impressum">Impressum</a>'
+        pages['impressum'] = f'<p>office@{domain}</p>'
+    elif kind == 3:
+        pages['contact'] = f'<p>mail@{domain}</p>'
+    pages[''] = f'<html><nav>{nav}</nav>{body}<footer>{footer}</footer></html>'
+    return pages
+
+
+def _loopback_resolver():
+    """aiohttp resolver sending every host name to 127.0.0.1 (benchmark websites share one local server)."""
+
+    class LoopbackResolver(aiohttp.abc.AbstractResolver):
+        async def resolve(self, host, port=0, family=socket.AF_INET):
+            return [{'hostname': host, 'host': '127.0.0.1', 'port': port, 'family': socket.AF_INET,
+                     'proto': 0, 'flags': socket.AI_NUMERICHOST}]
+
+        async def close(self):
+            pass
+
+    return LoopbackResolver()
+
+
+async def _start_bench_server(listings, batch=20):
+    """Serve the Maps stand-in at /maps and website n for Host bench-biz<n>.com."""
+    from aiohttp import web
+    counts = {'website_requests': 0}
+    sites = {}
+
+    async def handle(request):
+        host = request.host.split(':')[0]
+        if host.startswith('bench-biz'):
+            counts['website_requests'] += 1
+            n = int(host[len('bench-biz'):].split('.')[0])
+            pages = sites.setdefault(n, _bench_site_pages(n))
+            page = pages.get(request.path.strip('/'))
+            if page is None:
+                return web.Response(status=404, text='Not found')
+            return web.Response(text=page, content_type='text/html')
+        if request.path == '/maps' or request.path.startswith('/maps/'):
+            return web.Response(text=html, content_type='text/html')
+        return web.Response(status=404)
+
+    app = web.Application()
+    app.router.add_route('GET', '/{tail:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    port = runner.addresses[0][1]
+    html = (_BENCH_MAPS_HTML.replace('__TOTAL__', str(listings)).replace('__BATCH__', str(batch))
+            .replace('__SITES__', f'http://bench-biz{{n}}.com:{port}/'))
+    return runner, port, counts
+
+
+def _peak_rss_mb():
+    """Peak RSS of this process and of its finished children (e.g. the browser), in MB."""
+    import resource
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return own / scale, children / scale
+
+
+async def benchmark_offline(listings=100, websites=200, keywords=1, **launch_options):
+    """
+    End-to-end throughput against a local Maps stand-in and synthetic websites.
+
+    1. Websites: process_website over `websites` synthetic sites (websites/sec,
+       requests per email found).
+    2. End to end: run() on the Maps stand-in with `listings` cards for each
+       of `keywords` keywords, through the browser pool, keyword tabs,
+       enrichment workers and domain validation (listings/sec). Skipped with
+       listings=0; launch_options go to Chromium (e.g. executable_path).
+    Nothing touches the real caches, Google or ScraperAPI. Prints and returns
+    the results, including peak RSS.
+    """
+    import tempfile
+    runner, port, counts = await _start_bench_server(listings)
+    email_column = list(RECORD_COLUMNS).index('Email')
+    result = {}
+
+    def scheduler():
+        # No politeness delay against localhost, and never a paid fallback
+        return HostScheduler(min_interval=0, concurrency=HTTP_MAX_PER_HOST,
+                             fallback_budget=ScraperApiBudget(0))
+    try:
+        async with create_http_session(resolver=_loopback_resolver()) as session:
+            urls = [f"http://bench-biz{n}.com:{port}/" for n in range(websites)]
+            started = time.perf_counter()
+            emails = await enrich_websites(session, urls, scheduler=scheduler())
+            elapsed = time.perf_counter() - started
+            found = sum(len(e.split('\n')) for e in emails if e)
+            result.update({
+                'websites': websites,
+                'websites_per_sec': websites / elapsed,
+                'website_requests': counts['website_requests'],
+                'emails_found': found,
+                'requests_per_email': counts['website_requests'] / found if found else float('inf'),
+            })
+
+            if listings:
+                with tempfile.TemporaryDirectory() as tmp:
+                    stores = dict(
+                        domain_cache=DomainCache(os.path.join(tmp, "domains.sqlite3")),
+                        page_cache=PageCache(os.path.join(tmp, "pages")),
+                        dedup_index=DedupIndex(os.path.join(tmp, "dedup.sqlite3")),
+                        checkpoint=Checkpoint(os.path.join(tmp, "checkpoint.sqlite3")),
+                    )
+                    async with async_playwright() as playwright:
+                        pool = BrowserPool(playwright, size=1, **launch_options)
+                        started = time.perf_counter()
+                        data = await run(playwright, "California", "Springfield", "USA",
+                                         keywords=[f"Coffee Shop {k}" for k in range(keywords)],
+                                         http_session=session,
+                                         browser_pool=pool, scheduler=scheduler(),
+                                         maps_url=f"http://127.0.0.1:{port}/maps", **stores)
+                        elapsed = time.perf_counter() - started
+                        await pool.close()
+                    for store in stores.values():
+                        store.close()
+                result.update({
+                    'listings': len(data),
+                    'listings_per_sec': len(data) / elapsed,
+                    'listings_with_email': sum(1 for row in data if row[email_column]),
+                })
+    finally:
+        await runner.cleanup()
+
+    own_rss, child_rss = _peak_rss_mb()
+    result.update({'peak_rss_mb': own_rss, 'peak_child_rss_mb': child_rss})
+    for key, value in result.items():
+        print(f"{key:>22}: {value:.3f}" if isinstance(value, float) else f"{key:>22}: {value}")
+    return result
+
+# ═══════════════════════════════════════════════════════════════════════════════════
+# COMMAND LINE (stage subcommands, configuration, dry runs)
+# ═══════════════════════════════════════════════════════════════════════════════════
+
+def configure(**settings):
+    """
+    Override CONSTANTS from command-line flags (None values are skipped).
+
+    The values are also exported to the environment, so worker processes
+    started afterwards (sharded runs) read the same configuration.
+    """
+    for name, value in settings.items():
+        if value is None:
+            continue
+        globals()[name] = value
+        os.environ[name] = str(value)
+
+
+def read_inputs(path, column, unique=True):
+    """
+    Values to process: one per line, or the `column` of a CSV file with a header.
+
+    '-' reads standard input. Blank lines and duplicates are dropped unless
+    unique is False, which keeps one value (maybe '') per input row.
+    """
+    f = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    try:
+        lines = f.read().splitlines()
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    if lines and column in next(csv.reader(lines[:1])):
+        values = [row.get(column, '') for row in csv.DictReader(lines)]
+    else:
+        values = lines
+    if not unique:
+        return [(v or '').strip() for v in values]
+    return list(dict.fromkeys(v.strip() for v in values if v and v.strip()))
+
+
+def write_csv(path, header, rows):
+    """Write rows with a header to `path` ('-' = standard output)."""
+    f = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+    try:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+async def enrich_emails_command(args):
+    """enrich-emails: crawl websites for emails (no browser, no pandas)."""
+    websites = read_inputs(args.input, 'Website')
+    page_cache = PageCache()
+    scheduler = HostScheduler()
+    async with create_http_session() as http_session:
+        emails = await enrich_websites(http_session, websites, ENRICH_CONCURRENCY, page_cache,
+                                       scheduler)
+    page_cache.close()
+    write_csv(args.output, ('Website', 'Email'), zip(websites, emails))
+    print(f"Enriched {len(websites)} websites; {sum(map(bool, emails))} with emails. "
+          f"Host scheduler: {scheduler.report()}", file=sys.stderr)
+
+
+async def validate_domains_command(args):
+    """
+    validate-domains: reduce URLs to their registered domain and probe each once.
+
+    Writes one row per input; Domain and Valid URL stay empty for inputs that
+    don't reduce to a domain.
+    """
+    websites = read_inputs(args.input, 'Website', unique=False)
+    domains = [clean_url(value) if value else None for value in websites]
+    domain_cache = DomainCache()
+    async with create_http_session() as http_session:
+        valid = await validate_domains(http_session, domains, domain_cache, VALIDATE_CONCURRENCY,
+                                       HostScheduler())
+    domain_cache.close()
+    write_csv(args.output, ('Website', 'Domain', 'Valid URL'),
+              ((w, d or '', valid.get(d) or '') for w, d in zip(websites, domains)))
+    print(f"Validated {len(valid)} domains; {sum(map(bool, valid.values()))} answer.",
+          file=sys.stderr)
+
+
+def dry_run(command):
+    """Import what `command` needs, print the resolved configuration and stop."""
+    for name in STAGE_IMPORTS.get(command, ()):
+        importlib.import_module(name)
+    settings = ('SCRAPERAPI_KEY', 'GOOGLE_SHEET_ID', 'SINK_BACKEND', 'SHARD_WORKERS',
+                'ENRICH_CONCURRENCY', 'VALIDATE_CONCURRENCY', 'HTTP_MAX_CONNECTIONS',
+                'BROWSER_POOL_SIZE', 'SCRAPERAPI_BUDGET')
+    for name in settings:
+        value = globals()[name]
+        if name == 'SCRAPERAPI_KEY' and value:
+            value = value[:4] + '...'
+        print(f"{name:>22}: {value}")
+    heavy = ('pandas', 'aiohttp', 'tldextract', 'bs4', 'lxml', 'fake_useragent', 'playwright')
+    print(f"{'loaded':>22}: {', '.join(m for m in heavy if m in sys.modules) or '-'}")
+
+
+def build_parser():
+    """argparse parser: one subcommand per stage, plus workers and benchmarks."""
+    parser = argparse.ArgumentParser(
+        description="Google Maps business scraper with email discovery. "
+                    "Without a subcommand, runs scrape-maps.")
+    commands = parser.add_subparsers(dest='command')
+
+    def stage(name, help, concurrency_help):
+        command = commands.add_parser(name, help=help)
+        command.add_argument('--concurrency', type=int, help=concurrency_help)
+        command.add_argument('--scraperapi-key', help="ScraperAPI key (env SCRAPERAPI_KEY)")
+        command.add_argument('--dry-run', action='store_true',
+                             help="import the stage's dependencies, print the configuration, exit")
+        return command
+
+    maps = stage('scrape-maps', "search Maps for every city of the sheet and enrich the results",
+                 "websites crawled at once (env ENRICH_CONCURRENCY)")
+    maps.add_argument('--sheet-id', help="Google Sheets document (env GOOGLE_SHEET_ID)")
+    maps.add_argument('--sink', choices=('sheets', 'csv', 'parquet', 'sqlite'),
+                      help="where results go (env SINK_BACKEND)")
+    maps.add_argument('--workers', type=int, help="worker processes (env SHARD_WORKERS)")
+
+    for name, help, concurrency_help in (
+        ('enrich-emails', "crawl websites for emails", "websites crawled at once (env ENRICH_CONCURRENCY)"),
+        ('validate-domains', "check which domains answer", "domains probed at once (env VALIDATE_CONCURRENCY)"),
+    ):
+        command = stage(name, help, concurrency_help)
+        command.add_argument('input', nargs='?', default='-',
+                             help="file with one URL per line or a CSV with a Website column (default: stdin)")
+        command.add_argument('-o', '--output', default='-', help="CSV output file (default: stdout)")
+
+    worker = commands.add_parser('worker', help="pull cities from a shared work queue")
+    worker.add_argument('queue', nargs='?', help="work queue file (default: gmaps_cache/work_queue.sqlite3)")
+
+    commands.add_parser('benchmark-emails', help="extract_emails vs the original extractor").add_argument(
+        'directory', nargs='?', help="saved .html pages (labelled edge cases are always included)")
+    contacts = commands.add_parser('benchmark-contacts', help="ranked vs exhaustive contact discovery")
+    contacts.add_argument('directory', nargs='?', help="saved sites (default: labelled synthetic sites)")
+    contacts.add_argument('--sites', type=int, default=CONTACT_BENCH_SITES,
+                          help="number of synthetic sites without a directory")
+    offline = commands.add_parser('benchmark-offline', help="end-to-end run against local stand-ins")
+    for name, default in (('listings', 100), ('websites', 200), ('keywords', 1)):
+        offline.add_argument(name, nargs='?', type=int, default=default)
+    commands.add_parser('benchmark-headers', help="header pool vs a new UserAgent() per request")
+    commands.add_parser('benchmark-normalize', help="batch vs per-record post-processing").add_argument(
+        'rows', nargs='?', type=int, default=100_000)
+    commands.add_parser('benchmark-startup', help="cold-start time of each stage subcommand").add_argument(
+        '--repeat', type=int, default=5)
+    return parser
+
+
+def cli(argv=None):
+    """Parse the command line, apply configuration flags and run the subcommand."""
+    if argv is None and 'ipykernel' in sys.modules:
+        argv = []   # Colab / Jupyter: sys.argv holds the kernel's own arguments
+    args = build_parser().parse_args(argv)
+    command = args.command or 'scrape-maps'
+    configure(SCRAPERAPI_KEY=getattr(args, 'scraperapi_key', None),
+              GOOGLE_SHEET_ID=getattr(args, 'sheet_id', None),
+              SINK_BACKEND=getattr(args, 'sink', None),
+              SHARD_WORKERS=getattr(args, 'workers', None))
+    concurrency = 'VALIDATE_CONCURRENCY' if command == 'validate-domains' else 'ENRICH_CONCURRENCY'
+    configure(**{concurrency: getattr(args, 'concurrency', None)})
 
-    await asyncio.gather(*tasks)
+    if getattr(args, 'dry_run', False):
+        dry_run(command)
+    elif command == 'scrape-maps':
+        asyncio.run(main())
+    elif command == 'enrich-emails':
+        asyncio.run(enrich_emails_command(args))
+    elif command == 'validate-domains':
+        asyncio.run(validate_domains_command(args))
+    elif command == 'worker':
+        asyncio.run(shard_worker(args.queue))
+    elif command == 'benchmark-emails':
+        benchmark_extract_emails(args.directory)
+    elif command == 'benchmark-contacts':
+        benchmark_contact_discovery(args.directory, args.sites)
+    elif command == 'benchmark-offline':
+        asyncio.run(benchmark_offline(args.listings, args.websites, args.keywords))
+    elif command == 'benchmark-headers':
+        benchmark_headers()
+    elif command == 'benchmark-normalize':
+        benchmark_normalize(args.rows)
+    elif command == 'benchmark-startup':
+        benchmark_startup(args.repeat)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════════
@@ -642,4 +4481,5 @@ if __name__ == "__main__":
     except ImportError:
         pass
     
-    asyncio.run(main())
+    # python google_maps_business_scraper.py [scrape-maps|enrich-emails|validate-domains|worker|benchmark-*] ...
+    cli()